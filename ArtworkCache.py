@@ -0,0 +1,128 @@
+# Copyright (c) 2026 Sean M. Graham <www.sean-graham.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+import os
+import re
+import time
+import logging
+import sqlite3
+import threading
+
+class ArtworkCache(object):
+    """Remembers artwork search results between runs.
+
+    Maps a normalized (artist, title) to the resolved artwork URL, or to None
+    when the search came back empty, so the same track never has to be
+    searched for twice.  Entries older than `ttl` seconds are treated as
+    missing, and once there are more than `maxEntries` the least recently
+    used ones are thrown away."""
+
+    logger = logging.getLogger("artwork cache")
+
+    ttl = 30 * 24 * 60 * 60
+    maxEntries = 10000
+
+    # a hit only records when the entry was used if the last record is at
+    # least this old; eviction doesn't need anything finer, and most hits
+    # then don't write at all
+    touchInterval = 24 * 60 * 60
+
+    hits = 0
+    misses = 0
+
+    def __init__(self, dbPath, ttl=None, maxEntries=None):
+        if(ttl is not None):
+            self.ttl = ttl
+        if(maxEntries is not None):
+            self.maxEntries = maxEntries
+
+        # lookups happen on the artwork thread, not the one that opened us
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.expanduser(dbPath),
+                                    check_same_thread=False)
+
+        # it's only a cache: losing the last few writes to a power cut is
+        # fine, an fsync per write isn't
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS artwork (
+            artist text NOT NULL,
+            title text NOT NULL,
+            url text,
+            fetched real NOT NULL,
+            used real NOT NULL,
+            PRIMARY KEY (artist, title)
+            );''')
+        self.conn.execute('''
+            CREATE INDEX IF NOT EXISTS artwork_used ON artwork (used);''')
+        self.conn.commit()
+
+    def normalize(self, text):
+        return re.sub(r'\s+', ' ', (text or "").strip()).casefold()
+
+    def get(self, artist, title):
+        """Returns (found, url).  url may be None for a cached empty result."""
+        key = (self.normalize(artist), self.normalize(title))
+        now = time.time()
+
+        with self.lock:
+            row = self.conn.execute('''
+                SELECT url, fetched, used FROM artwork
+                WHERE artist = ? AND title = ?''', key).fetchone()
+
+            if((row is None) or (now - row[1] > self.ttl)):
+                self.misses += 1
+                return (False, None)
+
+            if(now - row[2] >= self.touchInterval):
+                self.conn.execute('''
+                    UPDATE artwork SET used = ?
+                    WHERE artist = ? AND title = ?''', (now,) + key)
+                self.conn.commit()
+
+            self.hits += 1
+            return (True, row[0])
+
+    def put(self, artist, title, url):
+        key = (self.normalize(artist), self.normalize(title))
+        now = time.time()
+
+        with self.lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO artwork (artist, title, url, fetched, used)
+                VALUES (?, ?, ?, ?, ?)''', key + (url, now, now))
+
+            count = self.conn.execute('SELECT COUNT(*) FROM artwork').fetchone()[0]
+
+            if(count > self.maxEntries):
+                self.conn.execute('''
+                    DELETE FROM artwork WHERE rowid IN (
+                    SELECT rowid FROM artwork ORDER BY used LIMIT ?)''',
+                    (count - self.maxEntries,))
+
+            self.conn.commit()
+
+    def close(self):
+        self.logger.debug(f"Artwork cache: {self.hits} hits, {self.misses} misses")
+
+        with self.lock:
+            self.conn.close()
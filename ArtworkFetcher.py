@@ -0,0 +1,135 @@
+# Copyright (c) 2026 Sean M. Graham <www.sean-graham.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+"""Downloads artwork for plugins that want a local copy of it.
+
+Every download is written to a temporary file beside the destination and
+only renamed into place once it's complete and looks like an image, so a
+file at the destination is always a good one and a failed download leaves
+nothing behind to be mistaken for a cached copy.  Plugins asking for the
+same file at the same time (CsvFileTarget and AudioHijackTarget on the same
+track, or the archive prefetch) share a single download."""
+
+import os
+import logging
+import tempfile
+import threading
+
+import requests
+
+import HttpClient
+
+chunkSize = 256 * 1024
+
+logger = logging.getLogger("artwork fetcher")
+
+# destination path -> Event set when the download of it finishes
+_inFlight = {}
+_inFlightLock = threading.Lock()
+
+def cached(path):
+    # an empty file is what a failed download used to leave behind
+    try:
+        return os.path.getsize(path) > 0
+    except OSError:
+        return False
+
+def fetch(url, path):
+    """Download url to path unless it's already there.  Returns path, or
+    False if the download failed."""
+    if(cached(path)):
+        logger.debug("Artwork file already exists. Skipping")
+        return path
+
+    with _inFlightLock:
+        done = _inFlight.get(path)
+        owner = done is None
+        if(owner):
+            done = _inFlight[path] = threading.Event()
+
+    if(not owner):
+        # someone else is already downloading it
+        done.wait()
+        return path if cached(path) else False
+
+    try:
+        return path if download(url, path) else False
+    finally:
+        with _inFlightLock:
+            del _inFlight[path]
+        done.set()
+
+def download(url, path):
+    try:
+        response = HttpClient.get(url, stream=True)
+    except requests.RequestException as e:
+        logger.warning(f"Artwork download failed: {url}: {e}")
+        return False
+
+    with response:
+        if(not response.ok):
+            logger.warning(f"Artwork download failed ({response.status_code}): {url}")
+            return False
+
+        contentType = response.headers.get('Content-Type', '')
+        if(contentType and not contentType.lower().startswith('image/')):
+            logger.warning(f"Artwork download wasn't an image ({contentType}): {url}")
+            return False
+
+        # with a Content-Encoding the length is of the encoded body, not
+        # what iter_content() gives us
+        expected = None
+        if(response.headers.get('Content-Encoding', 'identity') == 'identity'):
+            try:
+                expected = int(response.headers['Content-Length'])
+            except (KeyError, ValueError):
+                pass
+
+        fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                       prefix='.artwork-', suffix='.tmp')
+        try:
+            size = 0
+            with os.fdopen(fd, 'wb') as handle:
+                for block in response.iter_content(chunkSize):
+                    handle.write(block)
+                    size += len(block)
+
+            if(size == 0):
+                logger.warning(f"Artwork download was empty: {url}")
+                os.remove(tmpPath)
+                return False
+
+            if((expected is not None) and (size != expected)):
+                logger.warning(f"Artwork download was cut short ({size} of {expected} bytes): {url}")
+                os.remove(tmpPath)
+                return False
+
+            # mkstemp() files are private, artwork files never were
+            os.chmod(tmpPath, 0o644)
+            os.replace(tmpPath, path)
+        except (requests.RequestException, OSError) as e:
+            logger.warning(f"Artwork download failed: {url}: {e}")
+            try:
+                os.remove(tmpPath)
+            except OSError:
+                pass
+            return False
+
+    return True
@@ -0,0 +1,100 @@
+# Copyright (c) 2026 Sean M. Graham <www.sean-graham.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+"""Shared HTTP session for everything that talks to the network.
+
+All outbound requests go through one requests.Session so connections (and
+TLS handshakes) are reused for the whole show, every request gets a connect
+and read timeout, and transient failures are retried a bounded number of
+times with a jittered backoff."""
+
+import random
+import threading
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+connectTimeout = 3.05
+readTimeout = 10
+maxRetries = 2
+backoffFactor = 0.5
+poolSize = 4
+
+_session = None
+_sessionLock = threading.Lock()
+
+class JitteredRetry(Retry):
+    # spread retries out so several threads hitting the same failure don't
+    # all come back at once
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+
+        return backoff * random.uniform(0.5, 1.5)
+
+def configure(config):
+    """Pick up optional [http] overrides from the .trackupdaterc config"""
+    global connectTimeout, readTimeout, maxRetries, backoffFactor, poolSize
+
+    if(not config.has_section('http')):
+        return
+
+    connectTimeout = config.getfloat('http', 'connectTimeout', fallback=connectTimeout)
+    readTimeout = config.getfloat('http', 'readTimeout', fallback=readTimeout)
+    maxRetries = config.getint('http', 'maxRetries', fallback=maxRetries)
+    backoffFactor = config.getfloat('http', 'backoffFactor', fallback=backoffFactor)
+    poolSize = config.getint('http', 'poolSize', fallback=poolSize)
+
+def session():
+    global _session
+
+    with _sessionLock:
+        if(_session is None):
+            retry = JitteredRetry(total=maxRetries,
+                                  backoff_factor=backoffFactor,
+                                  status_forcelist=(429, 500, 502, 503, 504),
+                                  allowed_methods=frozenset(['GET', 'HEAD']),
+                                  raise_on_status=False)
+
+            # pool_block caps the number of connections open to any one host
+            adapter = HTTPAdapter(pool_connections=poolSize,
+                                  pool_maxsize=poolSize,
+                                  pool_block=True,
+                                  max_retries=retry)
+
+            _session = requests.Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+
+        return _session
+
+def get(url, **kwargs):
+    kwargs.setdefault('timeout', (connectTimeout, readTimeout))
+
+    return session().get(url, **kwargs)
+
+def close():
+    global _session
+
+    with _sessionLock:
+        if(_session is not None):
+            _session.close()
+            _session = None
@@ -19,6 +19,8 @@
 # IN THE SOFTWARE.
 
 import os
+import time
+import tempfile
 import datetime
 import logging
 from datetime import date
@@ -34,6 +36,36 @@ class Target(object):
     # from the db.  Plugins have to ask to be included by setting this true
     enableArchive = False  
 
+    # plugins that call track.fetchArtwork() say so, and archive mode
+    # downloads the episode's artwork for them ahead of time
+    usesArtwork = False
+
+    # each plugin is fed from its own queue and thread; these pick the
+    # overflow policy ("block", "drop_oldest" or "coalesce") and queue
+    # length.  None means use the [trackupdate] defaults.
+    queuePolicy = None
+    queueSize = None
+
+    # how hard logToFile() works to get text onto the disk:
+    #   always        - flush and fsync after every write
+    #   interval=<ms> - flush after every write, fsync at most once per <ms>
+    #   on_close      - keep it buffered until closeFile()
+    #   atomic        - like on_close, but the whole file is written to a
+    #                   temporary file and renamed over the real one by
+    #                   closeFile(), so a crash never leaves half a file.
+    #                   After an error abortFiles() throws it away instead.
+    # None means use the [trackupdate] default for the mode we're in.  Until
+    # setDurability() is called (after __init__) writes are only buffered.
+    durability = None
+    syncInterval = None
+    lastSync = None
+
+    # files opened under a temporary name that haven't been renamed into
+    # place yet: {fh: (path, tmpPath)}
+    pendingFiles = None
+
+    fileBufferSize = 64 * 1024
+
     def __init__(self, config, episode, episodeDate):
         print("If this were a real plugin we would do some initalization here")
 
@@ -50,6 +82,12 @@ class Target(object):
         print("id: " + track.uniqueId)
         print("artwork: " + track.artwork)
 
+    def updateArtwork(self, track):
+        # called (from the artwork lookup thread) when the artwork search
+        # finishes for the track most recently passed to logTrack().  The
+        # track's artworkURL has already been updated. Most plugins don't care.
+        return
+
     def getLongDate(self):
         text = ""
 
@@ -78,9 +116,142 @@ class Target(object):
     def getEpisodeTitle(self, episodeNumber):
         return f"Episode {episodeNumber} - {self.getLongDate()}"
 
+    def setDurability(self, policy):
+        interval = None
+        if(policy.startswith("interval=")):
+            try:
+                interval = float(policy[len("interval="):]) / 1000
+            except ValueError:
+                interval = -1
+
+            valid = (interval >= 0)
+        else:
+            valid = policy in ("always", "on_close", "atomic")
+
+        if(not valid):
+            self.logger.error(f"{self.pluginName}: Unknown durability "
+                              f"'{policy}', using 'always'")
+            policy = "always"
+            interval = None
+
+        self.durability = policy
+        self.syncInterval = interval
+
+        # files opened in __init__ become visible now unless they're to be
+        # renamed into place by closeFile()
+        if(policy != "atomic"):
+            for fh, (path, tmpPath) in list((self.pendingFiles or {}).items()):
+                fh.flush()
+                os.replace(tmpPath, path)
+                del self.pendingFiles[fh]
+
+        # whatever was written in __init__ (headers) follows the policy too
+        for fh in list(self.lastSync or {}):
+            self.syncFile(fh)
+
+    def openFile(self, path, newline=None):
+        # every file target writes through here, logToFile() and
+        # closeFile() so the durability policy applies to all of them.
+        # Until we know the policy isn't "atomic", write beside the real
+        # file so an existing one stays intact.  The unique name keeps
+        # episodes being regenerated in parallel out of each other's way.
+        if(self.durability in (None, "atomic")):
+            fh = tempfile.NamedTemporaryFile('w', buffering=self.fileBufferSize,
+                                             newline=newline,
+                                             dir=os.path.dirname(path) or '.',
+                                             prefix=os.path.basename(path) + '.',
+                                             suffix='.tmp', delete=False)
+
+            if(self.pendingFiles is None):
+                self.pendingFiles = {}
+            self.pendingFiles[fh] = (path, fh.name)
+
+            # temporary files are private, the files we write never were
+            os.chmod(fh.name, 0o644)
+        else:
+            fh = open(path, 'w', buffering=self.fileBufferSize,
+                      newline=newline)
+
+        if(self.lastSync is None):
+            self.lastSync = {}
+        self.lastSync[fh] = time.monotonic()
+
+        return fh
+
+    def syncFile(self, fh, force=False):
+        # for writers that don't go through logToFile() (csv.writer)
+        if(fh.closed or
+           (not force and self.durability in (None, "on_close", "atomic"))):
+            return
+
+        if(self.lastSync is None):
+            self.lastSync = {}
+
+        try:
+            fh.flush()
+
+            now = time.monotonic()
+            if(force or (self.durability == "always") or
+               (now - self.lastSync.get(fh, 0) >= self.syncInterval)):
+                os.fsync(fh.fileno())
+                self.lastSync[fh] = now
+        except OSError:
+            self.abortFile(fh)
+            raise
+
     def logToFile(self, fh, text):
-        fh.write(text)
+        # nothing more goes into a file that abortFiles() threw away
+        if(fh.closed):
+            return
+
+        try:
+            fh.write(text)
+        except OSError:
+            self.abortFile(fh)
+            raise
+
+        self.syncFile(fh)
+
+    def closeFile(self, fh):
+        if(fh.closed):
+            return
+
+        # whatever the policy, everything is on disk once this returns
+        self.syncFile(fh, force=True)
+        fh.close()
+
+        if(self.lastSync is not None):
+            self.lastSync.pop(fh, None)
+
+        if(self.pendingFiles and (fh in self.pendingFiles)):
+            path, tmpPath = self.pendingFiles.pop(fh)
+            os.replace(tmpPath, path)
+
+    def abortFile(self, fh):
+        # close a file that hasn't been renamed into place yet and remove
+        # it, leaving the real file as it was.  Files written in place are
+        # left alone.
+        if(not self.pendingFiles or (fh not in self.pendingFiles)):
+            return
+
+        path, tmpPath = self.pendingFiles.pop(fh)
+
+        if(self.lastSync is not None):
+            self.lastSync.pop(fh, None)
+
+        try:
+            fh.close()
+        except OSError:
+            # the final flush can fail the same way the last write did
+            pass
 
-        fh.flush()
-        os.fsync(fh.fileno())
+        try:
+            os.remove(tmpPath)
+        except FileNotFoundError:
+            pass
 
+    def abortFiles(self):
+        # called instead of publishing anything when __init__ or the run
+        # fails part way through; close() can still be called afterwards
+        for fh in list(self.pendingFiles or {}):
+            self.abortFile(fh)
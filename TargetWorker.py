@@ -0,0 +1,128 @@
+# Copyright (c) 2026 Sean M. Graham <www.sean-graham.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+import sys
+import logging
+import threading
+import traceback
+import dataclasses
+
+from collections import deque
+
+class TargetWorker(object):
+    """Feeds one Target from its own thread and bounded queue.
+
+    Each plugin gets a private copy of every track, so one plugin fiddling
+    with a track can't affect the others now that they run at the same
+    time.  Events are delivered to the
+    plugin in the order they were queued.  When the queue is full the
+    overflow policy decides what happens:
+
+        block       - wait for the plugin to catch up (nothing is lost)
+        drop_oldest - throw away the oldest pending event
+        coalesce    - only the newest track matters, a new track replaces
+                      everything still pending (good for "now playing"
+                      style targets)"""
+
+    logger = logging.getLogger("target worker")
+
+    policies = ("block", "drop_oldest", "coalesce")
+
+    def __init__(self, plugin, queueSize=16, policy="block"):
+        if(policy not in self.policies):
+            self.logger.error(f"{plugin.pluginName}: Unknown queue policy "
+                              f"'{policy}', using 'block'")
+            policy = "block"
+
+        self.plugin = plugin
+        self.queueSize = max(1, queueSize)
+        self.policy = policy
+
+        self.pending = deque()
+        self.closing = False
+        self.cond = threading.Condition()
+
+        self.thread = threading.Thread(target=self.run,
+                                       name=plugin.pluginName,
+                                       daemon=True)
+        self.thread.start()
+
+    def logTrack(self, track, startTime):
+        event = ("logTrack", track, dataclasses.replace(track), startTime)
+
+        with self.cond:
+            if(self.policy == "coalesce"):
+                self.pending.clear()
+
+            self.enqueue(event)
+
+    def updateArtwork(self, track):
+        with self.cond:
+            # a track that hasn't been logged yet just picks up the new URL
+            for pending in self.pending:
+                if((pending[0] == "logTrack") and (pending[1] is track)):
+                    pending[2].artworkURL = track.artworkURL
+                    return
+
+            self.enqueue(("updateArtwork", track,
+                          dataclasses.replace(track), None))
+
+    def enqueue(self, event):
+        # caller holds self.cond
+        while(len(self.pending) >= self.queueSize):
+            if(self.policy == "block"):
+                self.cond.wait()
+            else:
+                dropped = self.pending.popleft()
+                self.logger.warning(f"{self.plugin.pluginName}: Queue full, "
+                                    f"dropping {dropped[0]} for "
+                                    f"'{dropped[2].title}'")
+
+        self.pending.append(event)
+        self.cond.notify_all()
+
+    def run(self):
+        while(True):
+            with self.cond:
+                while((len(self.pending) == 0) and not self.closing):
+                    self.cond.wait()
+
+                if(len(self.pending) == 0):
+                    return
+
+                kind, source, track, startTime = self.pending.popleft()
+                self.cond.notify_all()
+
+            try:
+                if(kind == "logTrack"):
+                    self.plugin.logTrack(track, startTime)
+                else:
+                    self.plugin.updateArtwork(track)
+            except Exception as e:
+                self.logger.error(str(self.plugin) + f": Error trying to {kind}")
+                self.logger.error(''.join(traceback.format_tb(sys.exc_info()[2])))
+
+    def close(self):
+        # let everything already queued reach the plugin, then stop
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+
+        self.thread.join()
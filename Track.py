@@ -1,5 +1,4 @@
-import requests 
-import logging
+import ArtworkFetcher
 
 from dataclasses import dataclass
 from pathlib import Path
@@ -16,23 +15,7 @@ class Track:
     ignore: bool
     
     def fetchArtwork(self, coverImagePath):
-        logger = logging.getLogger("track base class")
+        # returns the local path, or False if the download failed
         p = Path(f'{expanduser(coverImagePath)}/{self.uniqueId}.jpg')
 
-        if(p.is_file() == False):
-            with p.open(mode='wb') as handle:
-                response = requests.get(self.artworkURL, stream=True)
-
-                if not response.ok:
-                    return False
-
-                for block in response.iter_content(1024):
-                    if not block:
-                        return False
-
-                    handle.write(block)
-        else:
-            logger.debug("Artwork file already exists. Skipping")
-
-        return str(p)
-        
+        return ArtworkFetcher.fetch(self.artworkURL, str(p))
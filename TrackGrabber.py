@@ -0,0 +1,181 @@
+# Copyright (c) 2026 Sean M. Graham <www.sean-graham.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+import json
+import logging
+import subprocess
+import threading
+import time
+
+class TrackGrabber(object):
+    """Reads the current player state from the track grabber helper.
+
+    In "poll" mode the grabber is run once per call, as it always has been.
+    In "stream" mode a single long-lived child is started and is expected to
+    write one JSON track state per line to stdout; getTrack() then just hands
+    back the most recent state.  If the child dies (or never produces
+    anything) we quietly fall back to running the grabber once per poll.
+    The child should repeat the current state at least every staleTime
+    seconds; while it's quieter than that it's assumed to be hung and the
+    grabber is run once per poll until the stream speaks up again."""
+
+    logger = logging.getLogger("track grabber")
+
+    grabberPath = "util/swinsian-track-grabber"
+    mode = "poll"
+    streamArgs = ["--stream"]
+    timeout = 5
+    staleTime = 60
+
+    proc = None
+    reader = None
+    latest = None
+    lastUpdate = None
+    waited = False
+    stale = False
+
+    def __init__(self, grabberPath=None, mode=None, streamArgs=None,
+                 timeout=None, staleTime=None):
+        if(grabberPath):
+            self.grabberPath = grabberPath
+        if(mode):
+            self.mode = mode
+        if(streamArgs is not None):
+            self.streamArgs = streamArgs
+        if(timeout is not None):
+            self.timeout = timeout
+        if(staleTime is not None):
+            self.staleTime = staleTime
+
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        # set whenever the stream reports a different state
+        self.changed = threading.Event()
+
+        if(self.mode == "stream"):
+            self.startStream()
+
+    def startStream(self):
+        try:
+            self.proc = subprocess.Popen([self.grabberPath] + self.streamArgs,
+                                         stdout=subprocess.PIPE,
+                                         stdin=subprocess.DEVNULL,
+                                         text=True,
+                                         bufsize=1)
+        except OSError as e:
+            self.logger.error(f"Unable to start grabber stream: {e}")
+            self.proc = None
+            return
+
+        self.logger.debug(f"Started grabber stream (pid {self.proc.pid})")
+
+        self.reader = threading.Thread(target=self.readStream,
+                                       args=(self.proc,),
+                                       daemon=True)
+        self.reader.start()
+
+    def readStream(self, proc):
+        for line in proc.stdout:
+            line = line.strip()
+
+            if(line == ""):
+                continue
+
+            try:
+                track = json.loads(line)
+            except json.decoder.JSONDecodeError:
+                self.logger.error("JSON decode in grabber stream, skipping line")
+                continue
+
+            with self.lock:
+                if(track != self.latest):
+                    self.changed.set()
+
+                self.latest = track
+                self.lastUpdate = time.monotonic()
+
+                if(self.stale):
+                    self.logger.info("Grabber stream is back")
+                    self.stale = False
+
+            self.ready.set()
+
+        proc.wait()
+        self.logger.warning(f"Grabber stream exited ({proc.returncode}), "
+                            "falling back to polling")
+
+        # wake up anybody still waiting on the first state, or for a change
+        # (it's time to poll)
+        self.ready.set()
+        self.changed.set()
+
+    def isStreaming(self):
+        return (self.reader is not None) and self.reader.is_alive()
+
+    def getTrack(self):
+        if(self.isStreaming()):
+            # give the stream a chance to produce its first state, but only
+            # once: after that a quiet stream is a stale one
+            if(not self.waited):
+                self.ready.wait(self.timeout)
+                self.waited = True
+
+            with self.lock:
+                track = self.latest
+
+                if((track is not None) and
+                   (time.monotonic() - self.lastUpdate > self.staleTime)):
+                    if(not self.stale):
+                        self.logger.warning("Grabber stream has gone quiet, "
+                                            "polling until it comes back")
+                        self.stale = True
+                    track = None
+
+            if(track is not None):
+                return track
+
+        return self.pollTrack()
+
+    def waitForChange(self, timeout):
+        """Wait until the stream reports a new state, or for timeout
+        seconds (the whole time when not streaming).  Returns True if there
+        was a change."""
+        changed = self.changed.wait(timeout)
+        self.changed.clear()
+
+        return changed
+
+    def pollTrack(self):
+        return json.loads(subprocess.check_output([self.grabberPath],
+                                                  text=True))
+
+    def close(self):
+        if(self.proc is None):
+            return
+
+        if(self.proc.poll() is None):
+            self.proc.terminate()
+
+            try:
+                self.proc.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+        self.proc = None
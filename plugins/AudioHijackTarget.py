@@ -22,11 +22,16 @@ from Target import Target
 from Track import Track
 
 import configparser
+import dataclasses
 import os
 import urllib.parse
 
 class AudioHijackTarget(Target):
     pluginName = "Audio Hijack Track Updater"
+    usesArtwork = True
+
+    # only the most recent track matters for now playing
+    queuePolicy = "coalesce"
 
     initDestination = "~/Library/Application Support/Audio Hijack/NowPlaying.txt"
     initTitle = ""
@@ -36,6 +41,7 @@ class AudioHijackTarget(Target):
     initArtwork = ""
     coverImagePath = ""
     stopArtwork = ""
+    nowPlaying = None
 
     def __init__(self, config, episode, episodeDate):
         if(episodeDate):
@@ -73,6 +79,18 @@ class AudioHijackTarget(Target):
         os.remove(self.initDestination)
 
     def logTrack(self, track, startTime):
+        # keep our own copy so a late artwork update can rewrite the file
+        self.nowPlaying = dataclasses.replace(track)
+        self.writeNowPlaying(self.nowPlaying)
+
+    def updateArtwork(self, track):
+        if(self.nowPlaying is None):
+            return
+
+        self.nowPlaying.artworkURL = track.artworkURL
+        self.writeNowPlaying(self.nowPlaying)
+
+    def writeNowPlaying(self, track):
         artworkPath = ""
 
         if( (track.artworkURL != None) and (self.stopArtwork not in track.artworkURL) ):
@@ -85,12 +103,12 @@ class AudioHijackTarget(Target):
         album = track.album or "";
         length = track.length or "";
 
-        track.title = track.title.replace("-", " ")
-
         fh = open(self.initDestination, 'w')
         fh.write(f"Title: {title.replace(' - ', '-') }\n")
         fh.write(f"Artist: {artist.replace(' - ', '-')}\n")
         fh.write(f"Album: {album.replace(' - ', '-')}\n")
         fh.write(f"Time: {length.replace(' - ', '-')}\n")
-        fh.write(f"Artwork: file://{urllib.parse.quote(artworkPath)}\n")
+        # fetchArtwork() returns False when the download fails
+        if(artworkPath):
+            fh.write(f"Artwork: file://{urllib.parse.quote(artworkPath)}\n")
         fh.close()
@@ -27,6 +27,7 @@ import logging
 
 import time
 import datetime
+import threading
 
 import csv
 
@@ -35,6 +36,7 @@ from datetime import date
 class CsvFileTarget(Target):
     pluginName = "CSV File Writer"
     enableArchive = True
+    usesArtwork = True
     showTitle = ""
     showArtist = ""
     episodeNumber = None
@@ -46,12 +48,21 @@ class CsvFileTarget(Target):
     trackCount = 0
     initialTime = None
 
+    # the artwork search finishes after logTrack(), so a row that still has
+    # the default artwork is held until updateArtwork() brings the real
+    # one, the next track comes in, or artworkTimeout seconds have passed
+    artworkTimeout = 5
+    pendingRow = None
+    pendingTimer = None
+
     logger = logging.getLogger("CSV updater")
 
     def __init__(self, config, episode, episodeDate):
         self.episodeNumber = episode
         if(episodeDate):
             self.episodeDate = episodeDate
+
+        self.lock = threading.Lock()
         
         # read config entries
         try:
@@ -67,6 +78,11 @@ class CsvFileTarget(Target):
             logging.error("ListCommon: Missing values in config")
             return
 
+        try:
+            self.artworkTimeout = float(config.get('trackupdate', 'artworkTimeout'))
+        except configparser.NoOptionError:
+            pass
+
         # default stopArtwork if empty
         if(self.stopArtwork == ""):
             todayName = date.today().strftime("%Y%m%d.jpg")
@@ -84,7 +100,7 @@ class CsvFileTarget(Target):
         fullFilePath = self.filePath + fileDate + ".csv"
         showYear = '{dt:%Y}'.format(dt=self.episodeDate)
 
-        self.csvFile = open(fullFilePath, 'w', newline='')
+        self.csvFile = self.openFile(fullFilePath, newline='')
         self.csvWriter = csv.writer(self.csvFile)
 
         self.csvWriter.writerow(["PODCAST",self.showTitle, None, None, None])
@@ -102,28 +118,84 @@ class CsvFileTarget(Target):
         if(self.initialTime == None):
             self.initialTime = startTime
 
-        if( (track.artworkURL != None) and (self.stopArtwork not in track.artworkURL) ):
-            artworkPath = track.fetchArtwork(self.coverImagePath)
+        with self.lock:
+            # whatever the last track found by now is what it gets
+            self.writePendingRow()
+
+            if( track.ignore is True):
+                return
+
+            if(self.hasArtwork(track)):
+                self.writeRow(track, startTime)
+            else:
+                self.pendingRow = (track, startTime)
+                self.pendingTimer = threading.Timer(self.artworkTimeout,
+                                                    self.flush)
+                self.pendingTimer.daemon = True
+                self.pendingTimer.start()
+
+        return
+
+    def updateArtwork(self, track):
+        # only ever about the track logged last
+        with self.lock:
+            if(self.pendingRow is None):
+                return
+
+            self.pendingRow[0].artworkURL = track.artworkURL
+            self.writePendingRow()
+
+        return
+
+    def hasArtwork(self, track):
+        return ( (track.artworkURL != None) and (self.stopArtwork not in track.artworkURL) )
+
+    def writeRow(self, track, startTime):
+        # caller holds self.lock.  Nothing more goes into a file that
+        # abortFiles() threw away.
+        if(self.csvFile.closed):
+            return
+
+        if(self.hasArtwork(track)):
+            # False when the download fails, leave the column empty
+            artworkPath = track.fetchArtwork(self.coverImagePath) or ""
         else:
             artworkPath = f"{self.coverImagePath}/{self.stopArtwork}"
 
-        if( track.ignore is not True):
-            # compute the time since the start of the show
-            tDelta = startTime - self.initialTime
+        # compute the time since the start of the show
+        tDelta = startTime - self.initialTime
 
-            self.trackCount += 1
+        self.trackCount += 1
 
-            tFormat = self.getTimeStamp(tDelta)
+        tFormat = self.getTimeStamp(tDelta)
 
-            self.csvWriter.writerow([track.title, tFormat, None,
-                                    artworkPath, False])
+        self.csvWriter.writerow([track.title, tFormat, None,
+                                artworkPath, False])
+        self.syncFile(self.csvFile)
 
-        return
+    def writePendingRow(self):
+        # caller holds self.lock
+        if(self.pendingTimer is not None):
+            self.pendingTimer.cancel()
+            self.pendingTimer = None
+
+        if(self.pendingRow is not None):
+            track, startTime = self.pendingRow
+            self.pendingRow = None
+            self.writeRow(track, startTime)
+
+    def flush(self):
+        # the artwork deadline passed, write the row with what it has
+        with self.lock:
+            self.writePendingRow()
 
     def close(self):
         print("Closing Csv File...")
 
-        self.csvFile.close()
+        with self.lock:
+            self.writePendingRow()
+
+        self.closeFile(self.csvFile)
 
         return
 
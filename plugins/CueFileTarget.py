@@ -74,7 +74,7 @@ class CueFileTarget(Target):
         headerText += f'TITLE "{self.getEpisodeTitle(self.episodeNumber)}"\n'
         headerText += f'FILE "{fileDate}.mp3" MP3\n'
 
-        self.cueFile = open(self.filePath + fileDate + ".cue", 'w+')
+        self.cueFile = self.openFile(self.filePath + fileDate + ".cue")
         self.logToFile(self.cueFile, headerText)
 
         return
@@ -107,7 +107,7 @@ class CueFileTarget(Target):
     def close(self):
         print("Closing Cue File...")
 
-        self.cueFile.close()
+        self.closeFile(self.cueFile)
 
         return
 
@@ -126,7 +126,7 @@ class HugoBlogTarget(Target):
         
         # Open file and write front matter
         try:
-            self.hugoFile = open(self.filePath + self.baseFilename + '.md', 'w+')
+            self.hugoFile = self.openFile(self.filePath + self.baseFilename + '.md')
             self.logToFile(self.hugoFile, frontMatter)
             
             # Add content header
@@ -146,7 +146,8 @@ class HugoBlogTarget(Target):
         except Exception as e:
             logging.error(f"HugoBlogTarget: Failed to create file: {e}")
             if self.hugoFile:
-                self.hugoFile.close()
+                # removes the half written temporary file too
+                self.abortFile(self.hugoFile)
                 self.hugoFile = None
             return
 
@@ -215,6 +216,6 @@ class HugoBlogTarget(Target):
         footer = f"\n\n*Total tracks: {self.trackCount}*\n"
         self.logToFile(self.hugoFile, footer)
         
-        self.hugoFile.close()
+        self.closeFile(self.hugoFile)
         
         return 
\ No newline at end of file
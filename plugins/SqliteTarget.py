@@ -29,17 +29,34 @@ import datetime
 from datetime import date
 
 import sqlite3
+import threading
+
+import track_schema
 
 class SqliteTarget(Target):
     pluginName = "Sqlite Writer"
     episodeNumber = -1
     conn = None
     c = None
+    lastRowId = None
+
+    # rows are committed in groups: as soon as commitRows are pending, or
+    # commitInterval seconds after the first uncommitted row, whichever
+    # comes first.  A crash loses at most commitInterval seconds of tracks.
+    synchronous = "NORMAL"
+    commitInterval = 2.0
+    commitRows = 50
+    pendingRows = 0
+    commitTimer = None
 
     def __init__(self, config, episode, episodeDate):
         self.episodeNumber = episode
         dbPath = ""
 
+        # the commit timer and the worker thread share the connection.  Set
+        # up before anything can return early, close() always needs it.
+        self.lock = threading.Lock()
+
         # read config entries
         try:
             dbPath = config.get('SqliteTarget', 'dbPath')
@@ -50,52 +67,117 @@ class SqliteTarget(Target):
             print("SqliteTarget: Missing values in config")
             return
 
+        try:
+            self.synchronous = config.get('SqliteTarget', 'synchronous').upper()
+        except configparser.NoOptionError:
+            pass
+
+        try:
+            self.commitInterval = float(config.get('SqliteTarget', 'commitInterval'))
+        except configparser.NoOptionError:
+            pass
+
+        try:
+            self.commitRows = int(config.get('SqliteTarget', 'commitRows'))
+        except configparser.NoOptionError:
+            pass
+
+        if(self.synchronous not in ("OFF", "NORMAL", "FULL", "EXTRA")):
+            print(f"SqliteTarget: Unknown synchronous level '{self.synchronous}', using NORMAL")
+            self.synchronous = "NORMAL"
+
         dbPath = os.path.expanduser(dbPath)
-        self.conn = sqlite3.connect(dbPath)
+        # writes happen on this plugin's worker thread, not the one
+        # that opened the connection
+        self.conn = sqlite3.connect(dbPath, check_same_thread=False)
         self.c = self.conn.cursor()
 
+        # WAL lets the web editor read while we're recording, and with
+        # synchronous=NORMAL a commit no longer waits on an fsync
+        self.c.execute("PRAGMA journal_mode=WAL")
+        self.c.execute(f"PRAGMA synchronous={self.synchronous}")
+
         self.createTables(self.c)
+        self.conn.commit()
 
         return
 
     def createTables(self, c):
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS trackupdate (
-            episodeNumber integer NOT NULL,
-            uniqueId char(128),
-            title char(128),
-            artist char(128),
-            album char(128),
-            length char(128),
-            startTime timestamp(128),
-            "ignore" integer(128) NOT NULL DEFAULT(0),
-            artworkUrl text(128)
-            );''')
-
+        # creates the table if needed and applies any pending migrations
+        track_schema.migrate(c.connection)
 
     def logTrack(self, track, startTime):
         if(startTime == -1):
             startTime = datetime.datetime.now()
 
         debool = (0,1)[track.ignore]
-        self.c.execute("INSERT INTO trackupdate VALUES (?,?,?,?,?,?,?,?,?)",
-                       (self.episodeNumber, 
-                        track.uniqueId,
-                        track.title,
-                        track.artist,
-                        track.album,
-                        track.length,
-                        startTime,
-                        debool,
-                        track.artworkURL))
 
-        self.conn.commit()
+        with self.lock:
+            self.c.execute(track_schema.INSERT_TRACK_SQL,
+                           (self.episodeNumber, 
+                            track.uniqueId,
+                            track.title,
+                            track.artist,
+                            track.album,
+                            track.length,
+                            startTime,
+                            debool,
+                            track.artworkURL,
+                            track_schema.to_epoch_us(startTime)))
+
+            self.lastRowId = self.c.lastrowid
+            self.rowWritten()
+
+        return
+
+    def updateArtwork(self, track):
+        if(self.lastRowId is None):
+            return
+
+        with self.lock:
+            self.c.execute("UPDATE trackupdate SET artworkUrl = ? WHERE rowid = ?",
+                           (track.artworkURL, self.lastRowId))
+
+            self.rowWritten()
 
         return
 
+    def rowWritten(self):
+        # caller holds self.lock
+        self.pendingRows += 1
+
+        if(self.pendingRows >= self.commitRows):
+            self.commit()
+        elif(self.commitTimer is None):
+            self.commitTimer = threading.Timer(self.commitInterval, self.flush)
+            self.commitTimer.daemon = True
+            self.commitTimer.start()
+
+    def commit(self):
+        # caller holds self.lock
+        if(self.commitTimer is not None):
+            self.commitTimer.cancel()
+            self.commitTimer = None
+
+        if(self.pendingRows > 0):
+            self.conn.commit()
+            self.pendingRows = 0
+
+    def flush(self):
+        with self.lock:
+            if(self.conn is not None):
+                self.commit()
+
     def close(self):
         print("Closing database...")
 
-        self.conn.close()
+        with self.lock:
+            # __init__ gives up before connecting if the config is missing
+            if(self.conn is None):
+                return
+
+            self.commit()
+            self.conn.close()
+            self.conn = None
 
         return
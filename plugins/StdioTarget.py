@@ -25,6 +25,9 @@ import os
 class StdioTarget(Target):
     pluginName = "stdio Track Updater"
 
+    # only the most recent track matters for now playing
+    queuePolicy = "coalesce"
+
     def __init__(self, config, episode, episodeDate):
         return
 
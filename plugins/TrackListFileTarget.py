@@ -64,7 +64,7 @@ class TrackListFileTarget(Target):
 
         fileDate = '{dt:%Y}{dt:%m}{dt:%d}'.format(dt=self.episodeDate)
 
-        self.trackListFile = open(self.filePath + fileDate + "-list.txt", 'w+')
+        self.trackListFile = self.openFile(self.filePath + fileDate + "-list.txt")
         return
 
     def logTrack(self, track, startTime):
@@ -88,6 +88,6 @@ class TrackListFileTarget(Target):
     def close(self):
         print("Closing Track List File...")
 
-        self.trackListFile.close()
+        self.closeFile(self.trackListFile)
 
         return
@@ -71,7 +71,7 @@ class UTCsvFileTarget(Target):
         fullFilePath = self.filePath + fileDate + ".ut.csv"
         showYear = '{dt:%Y}'.format(dt=self.episodeDate)
 
-        self.csvFile = open(fullFilePath, 'w', newline='')
+        self.csvFile = self.openFile(fullFilePath, newline='')
         self.csvWriter = csv.writer(self.csvFile)
 
         self.csvWriter.writerow(["artist", "title", "timecode"])
@@ -92,13 +92,14 @@ class UTCsvFileTarget(Target):
 
         self.csvWriter.writerow([track.artist, track.title,
                                  f'{minutes:02}:{seconds:02}' ])
+        self.syncFile(self.csvFile)
 
         return
 
     def close(self):
         print("Closing UTCsv File...")
 
-        self.csvFile.close()
+        self.closeFile(self.csvFile)
 
         return
 
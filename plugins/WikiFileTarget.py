@@ -92,7 +92,7 @@ class WikiFileTarget(Target):
         headerText += "|'''Artist'''\n"
         headerText += "|'''Album'''\n"
 
-        self.wikiFile = open(self.filePath + fileDate + "-wiki.txt", 'w+')
+        self.wikiFile = self.openFile(self.filePath + fileDate + "-wiki.txt")
         self.logToFile(self.wikiFile, headerText)
 
         return
@@ -109,6 +109,6 @@ class WikiFileTarget(Target):
         print("Closing Wiki File...")
 
         self.logToFile(self.wikiFile, "|}" )
-        self.wikiFile.close()
+        self.closeFile(self.wikiFile)
 
         return
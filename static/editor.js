@@ -6,7 +6,12 @@ let currentEpisode = null;
 let tracks = [];
 let markers = [];
 let audioUrl = null;
+let waveformPeaks = null; // Precomputed peaks currently drawn: {url, index, level}
+let peaksWanted = null; // Peaks URL of the audio being loaded
 let firstTime = null;
+let firstTimeRaw = null; // firstTime as sent by the server
+let tracksEpisode = null; // Episode the loaded tracks belong to
+let tracksVersion = null; // Server change version of the loaded tracks
 let currentZoom = 20; // Default zoom level (pixels per second)
 let isDraggingMarker = false; // Track if we're currently dragging a marker
 let cascadeShiftMode = false; // When true, dragging a marker shifts all subsequent tracks
@@ -74,7 +79,10 @@ function initializeWaveform() {
         minPxPerSec: currentZoom,
         fillParent: false, // Don't fill parent, let it be wider when zoomed
         interact: true, // Enable interaction for scrolling
-        backend: 'WebAudio' // Use WebAudio backend instead of MediaElement to avoid HTML5 audio element
+        // MediaElement streams the audio with range requests, so with
+        // precomputed peaks nothing has to download the whole file.  The
+        // audio element it creates is hidden below.
+        backend: 'MediaElement'
     };
     
     if (regionsPlugin) {
@@ -176,6 +184,7 @@ function setupEventListeners() {
         if (e.target.value) {
             currentEpisode = parseInt(e.target.value);
             loadTracks(currentEpisode);
+            loadEpisodeAudio(currentEpisode);
         }
     });
 
@@ -228,6 +237,7 @@ function setupEventListeners() {
         document.getElementById('audioInfo').style.display = 'none';
         document.getElementById('uploadSection').classList.remove('collapsed');
         audioUrl = null;
+        waveformPeaks = null;
         if (wavesurfer) {
             wavesurfer.empty();
         }
@@ -252,6 +262,7 @@ function setupEventListeners() {
         if (wavesurfer && wavesurfer.getDuration()) {
             currentZoom = Math.min(currentZoom * 1.5, 500); // Max zoom
             wavesurfer.zoom(currentZoom);
+            refineWaveformPeaks();
             // Update markers after zoom
             if (tracks.length > 0) {
                 updateWaveformMarkers();
@@ -463,37 +474,96 @@ async function loadTracks(episodeNumber, preserveScroll = false) {
             savedScrollLeft = container.scrollLeft;
         }
         
-        const response = await fetch(`/api/episodes/${episodeNumber}/tracks`);
-        const data = await response.json();
+        const scroll = preserveScroll ? savedScrollLeft : null;
         
-        // Sort tracks by startTimeSeconds to ensure correct order
-        tracks = data.tracks.sort((a, b) => {
-            const timeA = a.startTimeSeconds || 0;
-            const timeB = b.startTimeSeconds || 0;
-            return timeA - timeB;
-        });
+        // If we already have this episode, only ask for what changed
+        const haveEpisode = tracksEpisode === episodeNumber && tracksVersion !== null;
+        const url = haveEpisode
+            ? `/api/episodes/${episodeNumber}/tracks?since=${tracksVersion}`
+            : `/api/episodes/${episodeNumber}/tracks`;
+        const headers = haveEpisode
+            ? { 'If-None-Match': `W/"${episodeNumber}-${tracksVersion}"` }
+            : {};
         
-        firstTime = data.firstTime ? new Date(data.firstTime) : null;
+        const response = await fetch(url, { headers: headers, cache: 'no-store' });
         
-        renderTracks();
-        // Only update markers if audio is loaded
-        if (wavesurfer && wavesurfer.getDuration() > 0) {
-            updateWaveformMarkers();
-            
-            // Restore scroll position after markers are updated
-            if (preserveScroll && container) {
-                // Use requestAnimationFrame to ensure markers are rendered
-                requestAnimationFrame(() => {
-                    container.scrollLeft = savedScrollLeft;
-                });
+        if (response.status === 304) {
+            // Nothing changed on the server, just redraw what we have
+            applyTrackData({ tracks: tracks, firstTime: firstTimeRaw, version: tracksVersion }, scroll);
+            return;
+        }
+        
+        const data = await response.json();
+        
+        if (data.since !== undefined) {
+            if (data.firstTime !== firstTimeRaw) {
+                // The episode's first track moved so every offset changed
+                tracksVersion = null;
+                await loadTracks(episodeNumber, preserveScroll);
+                return;
             }
+            data.tracks = mergeTrackDelta(tracks, data);
         }
+        
+        applyTrackData(data, scroll);
+        tracksEpisode = episodeNumber;
     } catch (error) {
         console.error('Error loading tracks:', error);
         alert('Error loading tracks: ' + error.message);
     }
 }
 
+// Apply a "since" response to the current track list: drop deleted tracks
+// and replace or add changed ones (matched by rowid)
+function mergeTrackDelta(currentTracks, delta) {
+    const deleted = new Set(delta.deleted || []);
+    const byRowid = new Map();
+    
+    currentTracks.forEach(track => {
+        if (!deleted.has(track.rowid)) {
+            byRowid.set(track.rowid, track);
+        }
+    });
+    delta.tracks.forEach(track => byRowid.set(track.rowid, track));
+    
+    return Array.from(byRowid.values());
+}
+
+// Show a track list returned by the server (from a load or a mutation that
+// returns the updated list). Pass savedScrollLeft to keep the scroll position.
+function applyTrackData(data, savedScrollLeft = null) {
+    const container = document.querySelector('.waveform-container');
+    
+    if (data.version !== undefined) {
+        tracksVersion = data.version;
+        tracksEpisode = currentEpisode;
+    }
+    
+    // Sort tracks by startTimeSeconds to ensure correct order
+    tracks = data.tracks.sort((a, b) => {
+        const timeA = a.startTimeSeconds || 0;
+        const timeB = b.startTimeSeconds || 0;
+        return timeA - timeB;
+    });
+    
+    firstTimeRaw = data.firstTime;
+    firstTime = data.firstTime ? new Date(data.firstTime) : null;
+    
+    renderTracks();
+    // Only update markers if audio is loaded
+    if (wavesurfer && wavesurfer.getDuration() > 0) {
+        updateWaveformMarkers();
+        
+        // Restore scroll position after markers are updated
+        if (savedScrollLeft !== null && container) {
+            // Use requestAnimationFrame to ensure markers are rendered
+            requestAnimationFrame(() => {
+                container.scrollLeft = savedScrollLeft;
+            });
+        }
+    }
+}
+
 // Track selection state
 let lastSelectedIndex = null;
 
@@ -716,49 +786,95 @@ function updateWaveformMarkers() {
     });
 }
 
-async function handleFileUpload(file) {
-    const formData = new FormData();
-    formData.append('file', file);
+function uploadHashKey(file) {
+    // A re-exported show gets a new modification time, so this is only
+    // ever the same for the same file
+    return `uploadHash:${file.name}:${file.size}:${file.lastModified}`;
+}
+
+async function uploadFileChunked(file) {
+    // Send the file in chunks, resuming from whatever the server has if a
+    // chunk fails, so a dropped connection doesn't start a big show over.
+    // If we've uploaded this exact file before, pass along its hash so the
+    // server can skip the upload when it still has it.
+    const response = await fetch('/api/uploads', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({
+            filename: file.name,
+            size: file.size,
+            episodeNumber: currentEpisode,
+            sha256: localStorage.getItem(uploadHashKey(file))
+        })
+    });
+    let status = await response.json();
+    if (!response.ok || status.complete) {
+        return status;
+    }
+
+    const uploadUrl = `/api/uploads/${status.uploadId}`;
+    const chunkSize = status.chunkSize;
+    const progress = document.querySelector('#dropZone p');
+    const progressText = progress.textContent;
+    let failures = 0;
 
     try {
-        const response = await fetch('/api/upload', {
-            method: 'POST',
-            body: formData
-        });
+        while (!status.complete) {
+            const end = Math.min(status.offset + chunkSize, file.size);
+            try {
+                const chunkResponse = await fetch(uploadUrl, {
+                    method: 'PUT',
+                    headers: {'Content-Range': `bytes ${status.offset}-${end - 1}/${file.size}`},
+                    body: file.slice(status.offset, end)
+                });
+                const result = await chunkResponse.json();
+                // The finished file didn't match its hash, the server has
+                // thrown it away so there's nothing to resume
+                if (chunkResponse.status === 422) {
+                    localStorage.removeItem(uploadHashKey(file));
+                    failures = 5;
+                    throw new Error(result.error);
+                }
+                // 409 still tells us where the server is up to
+                if (!chunkResponse.ok && chunkResponse.status !== 409) {
+                    throw new Error(result.error || `HTTP ${chunkResponse.status}`);
+                }
+                status = result;
+                failures = 0;
+            } catch (error) {
+                if (++failures > 5) {
+                    throw error;
+                }
+                console.warn(`Upload chunk failed, retrying: ${error.message}`);
+                await new Promise(resolve => setTimeout(resolve, 1000 * failures));
 
-        const data = await response.json();
+                try {
+                    const statusResponse = await fetch(uploadUrl);
+                    if (statusResponse.ok) {
+                        status = await statusResponse.json();
+                    }
+                } catch (statusError) {
+                    // Still unreachable, the next attempt will tell
+                }
+            }
+            progress.textContent = `Uploading ${file.name}... ${Math.floor(100 * status.offset / file.size)}%`;
+        }
+    } finally {
+        progress.textContent = progressText;
+    }
+
+    if (status.sha256) {
+        localStorage.setItem(uploadHashKey(file), status.sha256);
+    }
+    return status;
+}
+
+async function handleFileUpload(file) {
+    try {
+        const data = await uploadFileChunked(file);
         
         if (data.success) {
-            audioUrl = data.url;
-            document.getElementById('fileName').textContent = file.name;
-            document.getElementById('audioInfo').style.display = 'block';
-            document.getElementById('dropZone').style.display = 'none';
-            document.getElementById('toggleUploadSection').style.display = 'block';
-            
-            // Collapse the upload section after file is loaded
-            document.getElementById('uploadSection').classList.add('collapsed');
-            
-            // Load audio into wavesurfer
-            wavesurfer.load(audioUrl).then(() => {
-                // Hide any audio elements after loading
-                setTimeout(() => {
-                    const audioElements = document.querySelectorAll('audio');
-                    audioElements.forEach(audio => {
-                        audio.style.cssText = 'display: none !important; visibility: hidden !important; position: absolute !important; width: 0 !important; height: 0 !important; opacity: 0 !important; pointer-events: none !important;';
-                        audio.removeAttribute('controls');
-                    });
-                }, 100);
-                
-                // Set initial zoom after loading
-                if (wavesurfer.getDuration()) {
-                    wavesurfer.zoom(currentZoom);
-                }
-                // Markers will be added in the 'ready' event handler
-                // But also update them here in case tracks are already loaded
-                if (tracks.length > 0) {
-                    updateWaveformMarkers();
-                }
-            });
+            await loadAudio(data.url, data.peaksUrl, file.name);
         } else {
             alert('Error uploading file: ' + (data.error || 'Unknown error'));
         }
@@ -768,6 +884,142 @@ async function handleFileUpload(file) {
     }
 }
 
+async function loadEpisodeAudio(episodeNumber) {
+    // Bring back the audio last uploaded for this episode, if the store
+    // still has it and nothing else is loaded
+    if (audioUrl) return;
+
+    try {
+        const response = await fetch(`/api/episodes/${episodeNumber}/audio`);
+        if (!response.ok) return;
+        const data = await response.json();
+        if (data.uploads.length > 0 && !audioUrl && currentEpisode === episodeNumber) {
+            const upload = data.uploads[0];
+            await loadAudio(upload.url, upload.peaksUrl, upload.originalName || upload.filename);
+        }
+    } catch (error) {
+        console.warn('Could not load episode audio:', error);
+    }
+}
+
+async function loadAudio(url, peaksUrl, displayName) {
+    audioUrl = url;
+    document.getElementById('fileName').textContent = displayName;
+    document.getElementById('audioInfo').style.display = 'block';
+    document.getElementById('dropZone').style.display = 'none';
+    document.getElementById('toggleUploadSection').style.display = 'block';
+    
+    // Collapse the upload section after file is loaded
+    document.getElementById('uploadSection').classList.add('collapsed');
+    
+    // Load audio into wavesurfer.  With precomputed peaks the
+    // waveform draws right away instead of after the whole file
+    // has been downloaded and decoded.
+    const peaks = await loadWaveformPeaks(peaksUrl);
+    if (audioUrl !== url) {
+        // Another file was loaded while we waited for the peaks
+        return;
+    }
+    const loading = peaks ?
+        wavesurfer.load(audioUrl, [peaks.data], peaks.index.duration) :
+        wavesurfer.load(audioUrl);
+    loading.then(() => {
+        // Hide any audio elements after loading
+        setTimeout(() => {
+            const audioElements = document.querySelectorAll('audio');
+            audioElements.forEach(audio => {
+                audio.style.cssText = 'display: none !important; visibility: hidden !important; position: absolute !important; width: 0 !important; height: 0 !important; opacity: 0 !important; pointer-events: none !important;';
+                audio.removeAttribute('controls');
+            });
+        }, 100);
+        
+        // Set initial zoom after loading
+        if (wavesurfer.getDuration()) {
+            wavesurfer.zoom(currentZoom);
+        }
+        // Markers will be added in the 'ready' event handler
+        // But also update them here in case tracks are already loaded
+        if (tracks.length > 0) {
+            updateWaveformMarkers();
+        }
+    });
+}
+
+async function loadWaveformPeaks(peaksUrl) {
+    // Returns the peaks for the current zoom, or null if there aren't any
+    // and the browser has to decode the audio itself.  While the server is
+    // still computing them (202) keep asking, as often as it says to.
+    waveformPeaks = null;
+    peaksWanted = peaksUrl;
+    if (!peaksUrl) return null;
+
+    try {
+        let response = await fetch(peaksUrl);
+        while (response.status === 202) {
+            const retryAfter = parseFloat(response.headers.get('Retry-After'));
+            const delay = (retryAfter > 0 ? retryAfter : 2) * 1000;
+            await new Promise(resolve => setTimeout(resolve, delay));
+
+            // Another file was loaded in the meantime
+            if (peaksWanted !== peaksUrl) return null;
+            response = await fetch(peaksUrl);
+        }
+        if (response.status !== 200) {
+            return null;
+        }
+
+        const index = await response.json();
+        const level = pickPeaksLevel(index, currentZoom);
+        const data = await fetchPeaksLevel(peaksUrl, level);
+        waveformPeaks = {url: peaksUrl, index: index, level: level};
+        return {index: index, data: data};
+    } catch (error) {
+        console.warn('Could not load waveform peaks:', error);
+        return null;
+    }
+}
+
+function pickPeaksLevel(index, pxPerSec) {
+    // Coarsest level with at least one peak per bar (bars are ~3px apart)
+    const wanted = pxPerSec / 3;
+    const levels = index.levels.slice().sort((a, b) => a.peaksPerSecond - b.peaksPerSecond);
+    return levels.find(level => level.peaksPerSecond >= wanted) || levels[levels.length - 1];
+}
+
+async function fetchPeaksLevel(peaksUrl, level) {
+    const response = await fetch(`${peaksUrl}/${level.level}`);
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+
+    // Little-endian int16 min/max pairs, scaled to -1..1 for WaveSurfer
+    const view = new DataView(await response.arrayBuffer());
+    const data = new Float32Array(view.byteLength / 2);
+    for (let i = 0; i < data.length; i++) {
+        data[i] = view.getInt16(i * 2, true) / 32768;
+    }
+    return data;
+}
+
+async function refineWaveformPeaks() {
+    // Zoomed in past what the loaded level can show, swap in a finer one
+    if (!waveformPeaks || !wavesurfer) return;
+
+    const peaks = waveformPeaks;
+    const level = pickPeaksLevel(peaks.index, currentZoom);
+    if (level.peaksPerSecond <= peaks.level.peaksPerSecond) return;
+
+    try {
+        const data = await fetchPeaksLevel(peaks.url, level);
+        // Audio changed while we were fetching
+        if (waveformPeaks !== peaks) return;
+        waveformPeaks = {url: peaks.url, index: peaks.index, level: level};
+        wavesurfer.setOptions({peaks: [data], duration: peaks.index.duration});
+    } catch (error) {
+        console.warn('Could not load finer waveform peaks:', error);
+    }
+}
+
 function openTrackModal(trackIndex = null, startTimeSeconds = null) {
     const modal = document.getElementById('trackModal');
     const form = document.getElementById('trackForm');
@@ -819,30 +1071,16 @@ async function saveTrack() {
     };
 
     try {
-        let response;
         const existingTrack = trackId ? tracks.find(t => t.id === trackId) : null;
-        if (existingTrack) {
-            // Update existing track
-            response = await fetch(`/api/episodes/${currentEpisode}/tracks/${trackId}`, {
-                method: 'PUT',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(trackData)
-            });
-        } else {
-            // Create new track
-            response = await fetch(`/api/episodes/${currentEpisode}/tracks`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(trackData)
-            });
-        }
+        const operation = existingTrack
+            ? { op: 'update', id: trackId, track: trackData }
+            : { op: 'create', track: trackData };
 
-        if (response.ok) {
-            document.getElementById('trackModal').style.display = 'none';
-            await loadTracks(currentEpisode);
+        const error = await saveTrackOperations([operation]);
+        if (error) {
+            alert('Error saving track: ' + error);
         } else {
-            const error = await response.json();
-            alert('Error saving track: ' + (error.error || 'Unknown error'));
+            document.getElementById('trackModal').style.display = 'none';
         }
     } catch (error) {
         console.error('Error saving track:', error);
@@ -850,6 +1088,26 @@ async function saveTrack() {
     }
 }
 
+// Send track edits to the batch endpoint.  Its response carries the updated
+// track list, so there's no need to load it again.  Returns an error message,
+// or null if everything was saved.
+async function saveTrackOperations(operations, savedScrollLeft = null) {
+    const response = await fetch(`/api/episodes/${currentEpisode}/tracks`, {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ operations: operations })
+    });
+    const data = await response.json();
+
+    if (!response.ok) {
+        const failed = (data.results || []).find(result => result.error);
+        return (failed && failed.error) || data.error || `HTTP ${response.status}`;
+    }
+
+    applyTrackData(data, savedScrollLeft);
+    return null;
+}
+
 async function deleteTrack(index) {
     if (!confirm('Are you sure you want to delete this track?')) {
         return;
@@ -858,14 +1116,9 @@ async function deleteTrack(index) {
     const track = tracks[index];
     
     try {
-        const response = await fetch(`/api/episodes/${currentEpisode}/tracks/${track.id}`, {
-            method: 'DELETE'
-        });
-
-        if (response.ok) {
-            await loadTracks(currentEpisode);
-        } else {
-            alert('Error deleting track');
+        const error = await saveTrackOperations([{ op: 'delete', id: track.id }]);
+        if (error) {
+            alert('Error deleting track: ' + error);
         }
     } catch (error) {
         console.error('Error deleting track:', error);
@@ -901,16 +1154,15 @@ async function updateTrackTime(index, newTimeSeconds) {
         artworkUrl: track.artworkUrl
     };
 
-    try {
-        const response = await fetch(`/api/episodes/${currentEpisode}/tracks/${track.id}`, {
-            method: 'PUT',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(trackData)
-        });
+    // Preserve scroll position when updating track time (from marker drag)
+    const container = document.querySelector('.waveform-container');
+    const savedScrollLeft = container ? container.scrollLeft : null;
 
-        if (response.ok) {
-            // Preserve scroll position when updating track time (from marker drag)
-            await loadTracks(currentEpisode, true);
+    try {
+        const error = await saveTrackOperations(
+            [{ op: 'update', id: track.id, track: trackData }], savedScrollLeft);
+        if (error) {
+            console.error('Error updating track time:', error);
         }
     } catch (error) {
         console.error('Error updating track time:', error);
@@ -918,46 +1170,27 @@ async function updateTrackTime(index, newTimeSeconds) {
 }
 
 async function updateTrackTimeWithCascade(startIndex, newStartTime, deltaSeconds) {
-    // Update the dragged track first
-    const startTrack = tracks[startIndex];
-    const startTrackData = {
-        uniqueId: startTrack.uniqueId,
-        title: startTrack.title,
-        artist: startTrack.artist,
-        album: startTrack.album,
-        length: startTrack.length,
-        startTimeSeconds: newStartTime,
-        ignore: startTrack.ignore,
-        artworkUrl: startTrack.artworkUrl
-    };
+    // Moving the dragged track and every track after it by the same delta is
+    // a single shift, and the response carries the updated track list
+    const container = document.querySelector('.waveform-container');
+    const savedScrollLeft = container ? container.scrollLeft : null;
 
     try {
-        // Update the first track
-        const response = await fetch(`/api/episodes/${currentEpisode}/tracks/${startTrack.id}`, {
-            method: 'PUT',
+        const response = await fetch(`/api/episodes/${currentEpisode}/tracks/shift`, {
+            method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(startTrackData)
-        });
-
-        if (response.ok && deltaSeconds !== 0) {
-            // Shift all subsequent tracks by the same delta
-            const shiftResponse = await fetch(`/api/episodes/${currentEpisode}/tracks/shift`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    startIndex: startIndex + 1, // Start from the track after the dragged one
+            body: JSON.stringify({
+                ranges: [{
+                    startIndex: startIndex,
                     endIndex: null, // Shift all remaining tracks
                     deltaSeconds: deltaSeconds
-                })
-            });
+                }]
+            })
+        });
 
-            if (shiftResponse.ok) {
-                // Preserve scroll position when updating tracks
-                await loadTracks(currentEpisode, true);
-            }
-        } else if (response.ok) {
-            // No cascade needed, just reload
-            await loadTracks(currentEpisode, true);
+        if (response.ok) {
+            // Preserve scroll position when updating tracks
+            applyTrackData(await response.json(), savedScrollLeft);
         }
     } catch (error) {
         console.error('Error updating track time with cascade:', error);
@@ -1005,9 +1238,11 @@ async function shiftTracks() {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
-                startIndex: startIndex,
-                endIndex: endIndex,
-                deltaSeconds: deltaSeconds
+                ranges: [{
+                    startIndex: startIndex,
+                    endIndex: endIndex,
+                    deltaSeconds: deltaSeconds
+                }]
             })
         });
 
@@ -1016,7 +1251,7 @@ async function shiftTracks() {
             // Clear selections after shift
             document.querySelectorAll('.track-checkbox').forEach(cb => cb.checked = false);
             updateShiftButtonState();
-            await loadTracks(currentEpisode);
+            applyTrackData(await response.json());
         } else {
             alert('Error shifting tracks');
         }
@@ -33,14 +33,24 @@ import traceback
 import sqlite3
 import requests
 import re
+import HttpClient
+import threading
 
 from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from datetime import datetime,date
 from operator import attrgetter
 from Track import Track
+from TrackGrabber import TrackGrabber
+from ArtworkCache import ArtworkCache
+from TargetWorker import TargetWorker
 from pathlib import Path
 
+sys.path.append(os.path.join(os.path.split(os.path.abspath(__file__))[0], "util"))
+import track_schema
+
 pluginList = []
+workerList = []
 
 class TrackUpdate(object):
     introAlbum = ""
@@ -54,14 +64,37 @@ class TrackUpdate(object):
     archiveDate = None
     useDatabase = False
     pollTime = 10
+    grabberPath = "util/swinsian-track-grabber"
+    grabberMode = "poll"
+    grabberStaleTime = None
+    grabber = None
+    maxPollTime = 30
+    pollWindow = 15
     startTime = -1
+    trackStartTime = None
+    trackLength = 0
     useStopValues = False
     stopTitle = ""
     stopArtist = ""
     stopAlbum = ""
     stopArtwork = ""
     ignoreAlbum = None
+    artworkSearchURL = "https://itunes.apple.com/search"
+    artworkTimeout = 5
+    artworkWorkers = 2
+    artworkExecutor = None
+    artworkCachePath = "~/.trackupdate-artwork.sqlite"
+    artworkCacheTTL = None
+    artworkCacheSize = None
+    artworkCache = None
     pluginPattern = "*.py"
+    queuePolicy = "block"
+    queueSize = 16
+    durability = "always"
+    archiveDurability = "atomic"
+    archiveJobs = os.cpu_count() or 1
+    archiveTrackCount = 0
+    workerArgv = None
     dbPath = None
     conn = None
     c = None
@@ -78,19 +111,28 @@ the metadata in Audio Hijack's Broadcast module)
 Arguments:
     -v  --verbose     you are lonely and want trackupdate to talk more
     -e  --episode     the episode number (optional, used by some plugins)
-    -t  --polltime    the time to wait between polling iTunes
+    -t  --polltime    the time (in seconds, fractions allowed) to wait
+                      between polling iTunes
     -h  --help        show this help page
     -p  --pattern     plugin filename pattern (optional, defaults to '*.py')
     -a  --archive     use the sqlite db as the track source
+                      (with -a, -e also takes a range like 100-150 or
+                      "all" to regenerate many episodes at once)
+    -j  --jobs        episodes to regenerate at once (default: one per CPU)
 
 Example:
     ./trackupdate.py -e 42 -t 5 -v
+    ./trackupdate.py -a -e all -j 8
     """)
 
     def __init__(self,argv):
         config = None
         self.logger.setLevel(logging.WARNING)
 
+        # serializes plugin calls between the main loop and the artwork
+        # lookup thread
+        self.dispatchLock = threading.Lock()
+
         # process config file
         if not os.path.isfile(os.path.expanduser('~/.trackupdaterc')):
             self.logger.warning("Warning: no config .trackupdaterc file.")
@@ -98,9 +140,11 @@ Example:
         config = configparser.ConfigParser()
         config.read(os.path.expanduser('~/.trackupdaterc'))
 
+        HttpClient.configure(config)
+
         try:
             self.introAlbum = config.get('trackupdate', 'introAlbum')
-            self.pollTime = int(config.get('trackupdate', 'pollTime'))
+            self.pollTime = float(config.get('trackupdate', 'pollTime'))
             self.useStopValues = config.get('trackupdate', 'useStopValues')
             self.stopTitle = config.get('trackupdate', 'stopTitle')
             self.stopArtist = config.get('trackupdate', 'stopArtist')
@@ -119,14 +163,94 @@ Example:
             self.logger.error("[trackupdate]: Missing values in config")
             return
 
+        # optional grabber settings
+        try:
+            self.grabberPath = config.get('trackupdate', 'grabberPath')
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        try:
+            self.grabberMode = config.get('trackupdate', 'grabberMode')
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        try:
+            self.grabberStaleTime = float(config.get('trackupdate', 'grabberStaleTime'))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        # optional artwork search settings
+        try:
+            self.artworkSearchURL = config.get('trackupdate', 'artworkSearchURL')
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        try:
+            self.artworkTimeout = float(config.get('trackupdate', 'artworkTimeout'))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        try:
+            self.artworkCachePath = config.get('trackupdate', 'artworkCachePath')
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        try:
+            self.artworkCacheTTL = float(config.get('trackupdate', 'artworkCacheTTL'))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        try:
+            self.artworkCacheSize = int(config.get('trackupdate', 'artworkCacheSize'))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        # optional plugin queue settings (can be overridden per plugin)
+        try:
+            self.queuePolicy = config.get('trackupdate', 'queuePolicy')
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        try:
+            self.queueSize = int(config.get('trackupdate', 'queueSize'))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        # optional file target durability (can be overridden per plugin)
+        try:
+            self.durability = config.get('trackupdate', 'durability')
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        try:
+            self.archiveDurability = config.get('trackupdate', 'archiveDurability')
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        # optional adaptive polling settings
+        try:
+            self.maxPollTime = float(config.get('trackupdate', 'maxPollTime'))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
+        try:
+            self.pollWindow = float(config.get('trackupdate', 'pollWindow'))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
+
         self.coverImagePath = os.path.expanduser(self.coverImagePath) 
 
+        # options passed on to the processes regenerating each episode of a
+        # batch
+        self.workerArgv = []
+
         # process command-line arguments
         if(len(argv) > 0):
             try:
-                opts, args = getopt.getopt(sys.argv[1:], "h:e:t:p:va", ["help",
+                opts, args = getopt.getopt(argv, "h:e:t:p:vaj:", ["help",
                                            "episode=", "polltime=", 
-                                           "pattern=", "verbose", "archive"])
+                                           "pattern=", "verbose", "archive",
+                                           "jobs="])
             except (getopt.GetoptError) as err:
                 # print help information and exit:
                 self.logger.error(str(err)) # will print something like 
@@ -140,7 +264,7 @@ Example:
                 elif o in ("-a", "--archive"):
                     self.useDatabase = True
                 elif o in ("-t", "--polltime"):
-                    a = int(a)
+                    a = float(a)
                     if(a <= 0):
                         a = 1
 
@@ -148,6 +272,9 @@ Example:
                 elif o in ("-p", "--pattern"):
                     self.logger.debug("Plugin pattern set to: " + a)
                     self.pluginPattern = a
+                    self.workerArgv += ["-p", a]
+                elif o in ("-j", "--jobs"):
+                    self.archiveJobs = max(1, int(a))
                 elif o in ("-v", "--verbose"):
                     # remove any logging handlers created by logging before
                     # BasicConfig() is called
@@ -157,6 +284,7 @@ Example:
 
                     self.logger.setLevel(logging.DEBUG)
                     logging.debug("Starting up. Press Ctrl-C to stop.")
+                    self.workerArgv.append("-v")
                 elif o in ("-h", "--help"):
                     self.usage()
                     sys.exit()
@@ -174,43 +302,64 @@ Example:
             if(self.useDatabase):
                 self.logger.debug("In archive mode, reading from sqlite db")
                 self.logger.debug("Episode #: %s" % str(self.episodeNumber))
-                self.logger.debug("Time between polling: %i" % self.pollTime)
+                self.logger.debug("Time between polling: %s" % self.pollTime)
 
                 if(self.episodeNumber == "XX"):
                     self.logger.error('Episode number ("-e/--episode") required for archive mode')
+                elif((self.episodeNumber == "all") or ("-" in self.episodeNumber)):
+                    self.dbPath = os.path.expanduser(self.dbPath)
+                    self.archiveBatch()
                 else:
                     self.dbPath = os.path.expanduser(self.dbPath)
                     self.conn = sqlite3.connect(self.dbPath)
+                    track_schema.migrate(self.conn)
                     self.c = self.conn.cursor()
 
-                    # retrieve the first date 
-                    for row in self.c.execute("SELECT startTime FROM trackupdate WHERE episodeNumber = '%s' ORDER BY startTime LIMIT 1" % self.episodeNumber):
-                        sTime = datetime.fromisoformat(row[0])
-                        self.logger.debug("Archive Date: " + str(sTime))
-                        self.archiveDate = sTime
+                    # read the episode once, up front: it's a few dozen
+                    # rows and the artwork prefetch wants to see them all
+                    records = self.readArchive(self.episodeNumber)
+
+                    # the first date
+                    if(len(records) > 0):
+                        self.archiveDate = records[0][1]
+                        self.logger.debug("Archive Date: " + str(self.archiveDate))
 
                     self.loadPlugins(config)
 
-                    self.archiveLoop()
+                    self.archiveLoop(records)
             else:
                 self.logger.debug("In live mode, reading from Applescript")
                 self.logger.debug("Episode #: %s" % str(self.episodeNumber))
-                self.logger.debug("Time between polling: %i" % self.pollTime)
+                self.logger.debug("Time between polling: %s" % self.pollTime)
+
+                self.logger.debug("Grabber mode: %s" % self.grabberMode)
+
+                self.grabber = TrackGrabber(self.grabberPath, self.grabberMode,
+                                            staleTime=self.grabberStaleTime)
+
+                if(self.artworkCachePath != ""):
+                    self.artworkCache = ArtworkCache(self.artworkCachePath,
+                                                     self.artworkCacheTTL,
+                                                     self.artworkCacheSize)
 
                 self.loadPlugins(config)
                 self.liveLoop()
         except (KeyboardInterrupt,SystemExit):
-            self.cleanUp()
+            # live mode runs until it's stopped, but an archive run that's
+            # stopped part way through has only written part of each file
+            self.cleanUp(abort=self.useDatabase)
+        except Exception:
+            self.cleanUp(abort=True)
+            raise
 
     def liveLoop(self):
-        previousTrack = None
+        previousFingerprint = None
 
         if(self.introAlbum != ""):
             while(1):
                 if(self.startTime==-1):
                     try:
-                        trackJson = subprocess.check_output(["util/swinsian-track-grabber"])
-                        track = json.loads(trackJson)
+                        track = self.grabber.getTrack()
 
                     except subprocess.CalledProcessError:
                         self.logger.error("osascript failed, skipping track")
@@ -226,46 +375,113 @@ Example:
                     
 
                     if((len(track) == 0) or (album == self.introAlbum)):
-                        time.sleep(self.pollTime)
+                        self.grabber.waitForChange(self.pollTime)
                     else:
                         break
                 else:
                     break
 
         while(1):
-            track = json.loads(subprocess.check_output(["util/swinsian-track-grabber"],
-                                                        text=True))
+            track = self.grabber.getTrack()
+
+            # don't keep updating the track unnecessarily
+            fingerprint = self.trackFingerprint(track)
 
-            # this is jank but don't keep updating the track unnecessarily
-            if(previousTrack != track):
-                previousTrack = track
+            if(previousFingerprint != fingerprint):
+                previousFingerprint = fingerprint
 
                 if(len(track) > 0):
                     self.processCurrentTrack(track)
-                elif(self.useStopValues == 'True'):
-                    stopTrack = Track(self.stopTitle, 
-                                        self.stopArtist, 
-                                        self.stopAlbum, 
-                                        "9:99",
-                                        None,
-                                        "", 
-                                        False)
-                    self.updateTrack(stopTrack, datetime.now())
-
-            time.sleep(self.pollTime)
-
-    def searchArtwork(self, trackName, searchArtist, searchAlbum):
+                else:
+                    if(self.useStopValues == 'True'):
+                        stopTrack = Track(self.stopTitle, 
+                                            self.stopArtist, 
+                                            self.stopAlbum, 
+                                            "9:99",
+                                            None,
+                                            "", 
+                                            False)
+                        self.updateTrack(stopTrack, datetime.now())
+
+                    # nothing is playing, so there is no end to wait for
+                    self.trackStartTime = None
+
+            # in stream mode a new state wakes us up straight away, the
+            # delay only matters if the stream goes quiet or dies
+            self.grabber.waitForChange(self.nextPollDelay())
+
+    def trackFingerprint(self, track):
+        if(len(track) == 0):
+            return None
+
+        return (track.get('trackId'),
+                track.get('trackName'),
+                track.get('trackArtist'))
+
+    def parseLength(self, length):
+        # lengths come through as "M:SS" or "H:MM:SS" (or bare seconds)
+        if(not length):
+            return 0
+
+        try:
+            seconds = 0
+            for part in str(length).split(':'):
+                seconds = (seconds * 60) + float(part)
+        except ValueError:
+            return 0
+
+        return seconds
+
+    def nextPollDelay(self):
+        # poll quickly around the time the current track should end, and
+        # back off (up to maxPollTime) while there is plenty of it left
+        if((self.trackStartTime is None) or (self.trackLength <= 0)):
+            return self.pollTime
+
+        elapsed = (datetime.now() - self.trackStartTime).total_seconds()
+        remaining = self.trackLength - elapsed
+
+        if(remaining <= self.pollWindow):
+            return self.pollTime
+
+        return max(self.pollTime,
+                   min(self.maxPollTime, remaining - self.pollWindow))
+
+    def searchArtwork(self, trackName, searchArtist, searchAlbum, deadline=None):
         url100 = None
         url500 = None
 
+        if(self.artworkCache):
+            found, url500 = self.artworkCache.get(searchArtist, trackName)
+
+            if(found):
+                self.logger.debug("Artwork found in cache")
+                return url500
+
+        # each attempt (retries included) only gets whatever is left before
+        # the deadline, so a hung search doesn't outlive its track
+        timeout = self.artworkTimeout
+        if(deadline is not None):
+            timeout = deadline - time.monotonic()
+
+            if(timeout <= 0):
+                self.logger.debug("Artwork search missed its deadline before it started")
+                return None
+
         try:
             searchTerm = quote(f"{searchArtist} {trackName}")
-            searchUrl = f'https://itunes.apple.com/search?term={searchTerm}&entity=song&limit=1'
-            trackSearch = requests.get(searchUrl).json()
+            searchUrl = f'{self.artworkSearchURL}?term={searchTerm}&entity=song&limit=1'
+            trackSearch = HttpClient.get(searchUrl,
+                                         timeout=(min(HttpClient.connectTimeout, timeout),
+                                                  timeout)).json()
 
             if(trackSearch['resultCount'] > 0):
                 url100 = trackSearch["results"][0]["artworkUrl100"]
                 url500 = re.sub(r'100x100', '500x500', url100)
+
+            # remember empty results too, only failures are retried
+            if(self.artworkCache):
+                self.artworkCache.put(searchArtist, trackName, url500)
         except requests.exceptions.RequestException as e:
             print(f"Cover image search failed: {e}")
         except json.JSONDecodeError as e:
@@ -273,41 +489,190 @@ Example:
 
         return url500
 
-    def archiveLoop(self):
-        for row in self.c.execute("SELECT * FROM trackupdate WHERE episodeNumber = '%s' ORDER BY startTime" % self.episodeNumber):
-            episodeNumber = row[0]
-            uniqueId = row[1]
-            title = row[2]
-            artist = row[3]
-            album = row[4]
-            length = row[5]
-            sTime = row[6]
-            ignore = row[7]
-            artworkUrl = row[8]
-
-            t = Track(title,
-                        artist,
-                        album,
-                        length,
-                        artworkUrl,
-                        uniqueId,
-                        ignore)
-            
-            sTime = datetime.fromisoformat(sTime)
+    def lookupArtwork(self, track):
+        # the search runs off the main loop; plugins have already been handed
+        # the track with the default artwork and hear about the real artwork
+        # through updateArtwork() if it turns up before the deadline.  A
+        # second worker means a search that's still winding down can't hold
+        # up the next track's.
+        if(self.artworkExecutor is None):
+            self.artworkExecutor = ThreadPoolExecutor(max_workers=self.artworkWorkers,
+                                                      thread_name_prefix="artwork")
+
+        deadline = time.monotonic() + self.artworkTimeout
+        self.artworkExecutor.submit(self.resolveArtwork, track, deadline)
+
+    def resolveArtwork(self, track, deadline):
+        # don't bother if the track already changed while we were queued
+        if(self.currentTrack is not track):
+            return
+
+        artworkUrl = self.searchArtwork(track.title, track.artist, track.album,
+                                        deadline)
+
+        if(artworkUrl == None):
+            self.logger.debug("No artwork found in search, keeping default")
+            return
+
+        if(time.monotonic() > deadline):
+            self.logger.debug("Artwork search missed its deadline, keeping default")
+            return
+
+        with self.dispatchLock:
+            if(self.currentTrack is not track):
+                return
+
+            track.artworkURL = artworkUrl
+
+            for worker in workerList:
+                worker.updateArtwork(track)
+
+    def readArchive(self, episodeNumber):
+        # returns [(track, startTime), ...] for an episode in order.  The
+        # statement is parameterized so sqlite3 keeps it prepared, and only
+        # the columns a replay needs are read.  An episode is a few dozen
+        # rows, and the artwork prefetch wants all of them up front anyway.
+        rows = self.conn.execute("""SELECT title, artist, album, length, artworkUrl, uniqueId, "ignore", startTimeUs FROM trackupdate WHERE episodeNumber = ? ORDER BY startTimeUs""", (episodeNumber,)).fetchall()
+
+        return [(Track(title, artist, album, length, artworkUrl, uniqueId,
+                       ignore),
+                 track_schema.from_epoch_us(sTimeUs))
+                for title, artist, album, length, artworkUrl, uniqueId, ignore, sTimeUs in rows]
+
+    def prefetchArtwork(self, records):
+        # download every track's artwork at once before the replay starts,
+        # so plugins that want the files (CsvFileTarget) find them on disk
+        # instead of fetching them one track at a time
+        if(not any(plugin.usesArtwork for plugin in pluginList)):
+            return
+
+        tracks = {}
+        for track, startTime in records:
+            if( (track.artworkURL) and (self.stopArtwork not in track.artworkURL) ):
+                tracks.setdefault(track.uniqueId, track)
+
+        if(len(tracks) == 0):
+            return
+
+        def fetch(track):
+            try:
+                return track.fetchArtwork(self.coverImagePath)
+            except Exception as e:
+                self.logger.debug(f"Artwork prefetch failed for '{track.title}': {e}")
+                return False
+
+        # the HTTP pool allows poolSize connections per host, more threads
+        # would only wait for one
+        with ThreadPoolExecutor(max_workers=HttpClient.poolSize) as executor:
+            fetched = [path for path in executor.map(fetch, tracks.values()) if path]
+
+        self.logger.debug(f"Prefetched artwork for {len(fetched)} of {len(tracks)} tracks")
+
+    def archiveLoop(self, records):
+        self.prefetchArtwork(records)
+
+        for t, sTime in records:
             self.updateTrack(t,sTime)
+            self.archiveTrackCount += 1
 
         self.cleanUp()
 
-    def cleanUp(self):
-        self.logger.debug("Exiting...")
+    def archiveBatch(self):
+        conn = sqlite3.connect(self.dbPath)
+        track_schema.migrate(conn)
 
-        for plugin in pluginList:
+        if(self.episodeNumber == "all"):
+            rows = conn.execute("SELECT DISTINCT episodeNumber FROM trackupdate ORDER BY episodeNumber")
+        else:
             try:
-                plugin.close()
-            except Exception as e:
-                self.logger.error(plugin.pluginName + ": Error trying to close target")
-                self.logger.error(''.join(traceback.format_tb(sys.exc_info()[2])))
-    
+                first, last = (int(x) for x in self.episodeNumber.split("-", 1))
+            except ValueError:
+                self.logger.error(f"Bad episode range '{self.episodeNumber}', expected something like 100-150 or 'all'")
+                conn.close()
+                return
+
+            rows = conn.execute("SELECT DISTINCT episodeNumber FROM trackupdate WHERE episodeNumber BETWEEN ? AND ? ORDER BY episodeNumber", (first, last))
+
+        episodes = [row[0] for row in rows]
+        conn.close()
+
+        if(len(episodes) == 0):
+            self.logger.error(f"No episodes found for '{self.episodeNumber}'")
+            return
+
+        print(f"Regenerating {len(episodes)} episodes, {self.archiveJobs} at a time...")
+
+        # every episode gets a fresh process with its own plugin instances,
+        # which streams its rows once and writes its own files
+        startTime = time.monotonic()
+        trackCount = 0
+        failed = []
+
+        with ProcessPoolExecutor(max_workers=self.archiveJobs) as executor:
+            futures = [executor.submit(regenerateEpisode, episode,
+                                       self.workerArgv)
+                       for episode in episodes]
+
+            for future in as_completed(futures):
+                episode, tracks, seconds, error = future.result()
+
+                if(error is not None):
+                    self.logger.error(f"Episode {episode} failed: {error}")
+                    failed.append(episode)
+                else:
+                    self.logger.debug(f"Episode {episode}: {tracks} tracks in {seconds:.2f}s")
+                    trackCount += tracks
+
+        elapsed = max(time.monotonic() - startTime, 0.001)
+        done = len(episodes) - len(failed)
+
+        print(f"Regenerated {done} episodes ({trackCount} tracks) in "
+              f"{elapsed:.1f}s: {done / elapsed:.2f} episodes/s, "
+              f"{trackCount / elapsed:.0f} tracks/s")
+
+        if(len(failed) > 0):
+            print(f"Failed: {', '.join(str(episode) for episode in sorted(failed))}")
+
+    def cleanUp(self, abort=False):
+        self.logger.debug("Exiting...")
+
+        if(self.grabber):
+            self.grabber.close()
+
+        if(self.artworkExecutor):
+            self.artworkExecutor.shutdown(wait=True, cancel_futures=True)
+
+        # let every plugin finish what is queued for it before closing it
+        for worker in workerList:
+            worker.close()
+
+        try:
+            for plugin in pluginList:
+                try:
+                    # keep what's already there rather than publishing files
+                    # that were cut off
+                    if(abort):
+                        plugin.abortFiles()
+
+                    plugin.close()
+                except Exception as e:
+                    self.logger.error(plugin.pluginName + ": Error trying to close target")
+                    self.logger.error(''.join(traceback.format_tb(sys.exc_info()[2])))
+        finally:
+            # anything a close() didn't get to rename into place, because it
+            # failed part way or we never reached it, is removed rather than
+            # left behind as a .tmp file
+            for plugin in pluginList:
+                plugin.abortFiles()
+
+        if(self.artworkCache):
+            self.artworkCache.close()
+
+        HttpClient.close()
+
+        # a batch worker process goes on to its next episode with new plugins
+        del workerList[:]
+        del pluginList[:]
 
     def processCurrentTrack(self, t):
         iArtist = ""
@@ -327,11 +692,8 @@ Example:
         if('trackId' in t.keys()):
             iId = t['trackId']
 
-        artworkUrl = self.searchArtwork(iName,iArtist,iAlbum)
-
-        if(artworkUrl == None):
-            self.logger.debug("No artwork found in search, using default")
-            artworkUrl = f"{self.coverImageBaseURL}/{self.stopArtwork}"
+        # start with the default artwork, the search happens in the background
+        artworkUrl = f"{self.coverImageBaseURL}/{self.stopArtwork}"
 
         track = Track(iName, 
                       iArtist, 
@@ -343,31 +705,36 @@ Example:
 
         self.updateTrack(track, datetime.now())
 
+        if(self.currentTrack is track):
+            self.lookupArtwork(track)
+
     def updateTrack(self, track, startTime):
         # make sure the track has actually changed
         if( (track.artist != self.currentTrack.artist) or 
             (track.title != self.currentTrack.title) ):
 
             self.currentTrack = track
+            self.trackStartTime = startTime
+            self.trackLength = self.parseLength(track.length)
             track.ignore = False
 
             if( track.album == self.ignoreAlbum ):
                 track.ignore = True
 
-            for plugin in pluginList:
-                try:
-                    plugin.logTrack(track, startTime)
-                except Exception as e:
-                    self.logger.error(str(plugin) + ": Error trying to update track")
-                    self.logger.error(''.join(traceback.format_tb(sys.exc_info()[2])))
+            # each plugin has its own worker thread, so a slow plugin only
+            # holds up itself
+            with self.dispatchLock:
+                for worker in workerList:
+                    worker.logTrack(track, startTime)
 
     def loadPlugins(self, config):
         self.logger.debug("Loading plugins...")
 
         scriptPath = os.path.split(os.path.abspath(__file__))[0]
         
-        sys.path.append(scriptPath)
-        sys.path.append(scriptPath + "/plugins/")
+        for path in (scriptPath, scriptPath + "/plugins/"):
+            if(path not in sys.path):
+                sys.path.append(path)
         pluginNames = glob.glob(scriptPath + "/plugins/" + self.pluginPattern)
         for x in pluginNames:
             className = x.replace(".py","").replace(scriptPath + "/plugins/","")
@@ -395,13 +762,69 @@ Example:
                 if(self.useDatabase and not cls.enableArchive):
                     self.logger.debug(f"{cls.pluginName} Plugin not enabled for archive mode, skipping")
                 else:
-                    # initialize the plugin
-                    o = cls(config, self.episodeNumber, self.archiveDate)
+                    # initialize the plugin.  It's created first so the
+                    # files it opened can be thrown away if __init__ fails.
+                    o = cls.__new__(cls)
+                    try:
+                        o.__init__(config, self.episodeNumber, self.archiveDate)
+                    except Exception:
+                        o.abortFiles()
+                        raise
+
+                    # queue settings: .rc section, then plugin default,
+                    # then the [trackupdate] default
+                    try:
+                        o.queuePolicy = config.get(className, 'queuePolicy')
+                    except (configparser.NoSectionError, configparser.NoOptionError):
+                        if(o.queuePolicy is None):
+                            o.queuePolicy = self.queuePolicy
+
+                    # an archive run has to hand every row to every plugin,
+                    # dropping or coalescing would leave holes in the files
+                    if(self.useDatabase and (o.queuePolicy != "block")):
+                        self.logger.debug(f"{o.pluginName}: using queuePolicy 'block' instead of '{o.queuePolicy}' in archive mode")
+                        o.queuePolicy = "block"
+
+                    try:
+                        o.queueSize = int(config.get(className, 'queueSize'))
+                    except (configparser.NoSectionError, configparser.NoOptionError):
+                        if(o.queueSize is None):
+                            o.queueSize = self.queueSize
+
+                    # durability: .rc section, then plugin default, then the
+                    # [trackupdate] default for live or archive mode
+                    try:
+                        durability = config.get(className, 'durability')
+                    except (configparser.NoSectionError, configparser.NoOptionError):
+                        durability = o.durability
+                        if(durability is None):
+                            if(self.useDatabase):
+                                durability = self.archiveDurability
+                            else:
+                                durability = self.durability
+
+                    o.setDurability(durability)
 
                     # add the plugin to the list
                     pluginList.append(o)
 
         pluginList.sort(key=attrgetter('priority'), reverse=True)
 
+        for plugin in pluginList:
+            workerList.append(TargetWorker(plugin, plugin.queueSize,
+                                           plugin.queuePolicy))
+
+def regenerateEpisode(episodeNumber, argv):
+    # runs in a batch worker process, see TrackUpdate.archiveBatch()
+    startTime = time.monotonic()
+
+    try:
+        trackUpdate = TrackUpdate(argv + ["-a", "-e", str(episodeNumber)])
+    except Exception as e:
+        return episodeNumber, 0, time.monotonic() - startTime, str(e)
+
+    return (episodeNumber, trackUpdate.archiveTrackCount,
+            time.monotonic() - startTime, None)
+
 if __name__ == "__main__":
     trackUpdate = TrackUpdate(sys.argv[1:])
@@ -26,11 +26,18 @@ import sqlite3
 import argparse
 import configparser
 import re
+import json
 import subprocess
+import shutil
 import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 
+import track_schema
+from probe_cache import ProbeCache, DEFAULT_PATH as DEFAULT_PROBE_CACHE_PATH
+
 try:
     from mutagen import File
     from mutagen.id3 import ID3NoHeaderError
@@ -38,6 +45,20 @@ try:
 except ImportError:
     MUTAGEN_AVAILABLE = False
 
+# Files probed at once during an import.  ffprobe spends most of its time
+# waiting on the disk rather than the CPU, so this can be well above the
+# number of cores.
+PROBE_WORKERS = 16
+
+# Files re-encoded at once when they don't match the rest of a stream copied
+# show, or decoded at once to measure them for a re-encoded one.  That's
+# CPU bound.
+TRANSCODE_WORKERS = os.cpu_count() or 1
+
+# Bump whenever probe_track() starts returning something different, so
+# results cached by older code aren't used
+PROBE_CACHE_VERSION = 2
+
 def parse_length_seconds(length_str):
     """Parse length string in MM:SS format and return total seconds"""
     parts = length_str.split(':')
@@ -57,36 +78,208 @@ def format_length(seconds):
     secs = seconds % 60
     return f"{minutes}:{secs:02d}"
 
-def get_audio_duration_ffprobe(file_path):
-    """Get precise audio duration using ffprobe (more accurate than mutagen)
-    Returns duration as float for maximum precision"""
+def resolve_track_path(file_path, m3u_base_dir=None):
+    """Absolute, normalized path of a file listed in an m3u"""
+    if not os.path.isabs(file_path) and m3u_base_dir:
+        file_path = os.path.join(m3u_base_dir, file_path)
+    return os.path.normpath(os.path.abspath(file_path))
+
+def probe_audio_ffprobe(file_path):
+    """Run ffprobe once and return (duration, tags).  duration is a float
+    (None if ffprobe failed) and tags is a dict with lowercased keys."""
     try:
         cmd = [
             'ffprobe',
             '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
+            '-show_entries', 'format=duration:format_tags:stream_tags',
+            '-of', 'json',
             file_path
         ]
         result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        duration_float = float(result.stdout.strip())
-        return duration_float  # Return as float for maximum precision
+        probe = json.loads(result.stdout)
     except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return None, {}
+    
+    tags = {}
+    # Some formats (ogg) keep their tags on the stream
+    for stream in probe.get('streams', []):
+        tags.update({k.lower(): v for k, v in stream.get('tags', {}).items()})
+    fmt = probe.get('format', {})
+    tags.update({k.lower(): v for k, v in fmt.get('tags', {}).items()})
+    
+    try:
+        duration = float(fmt['duration'])
+    except (KeyError, TypeError, ValueError):
+        duration = None
+    
+    return duration, tags
+
+# MPEG audio sample rates by version bits (3 = MPEG 1, 2 = MPEG 2, 0 = MPEG 2.5)
+MPEG_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+
+def _be(data):
+    return int.from_bytes(data, 'big')
+
+def _skip_id3v2(f):
+    """Offset of the first byte after any ID3v2 tags at the start of f"""
+    offset = 0
+    while True:
+        f.seek(offset)
+        head = f.read(10)
+        if len(head) < 10 or head[:3] != b'ID3':
+            return offset
+        # syncsafe size, plus a footer if the flag says there is one
+        size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        offset += 10 + size + (10 if head[5] & 0x10 else 0)
+
+def _mp3_header_duration(f, offset):
+    """Frame count from a Xing/Info or VBRI header, the same place ffprobe
+    gets its duration from"""
+    f.seek(offset)
+    header = f.read(4)
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    
+    version = (header[1] >> 3) & 3
+    layer = (header[1] >> 1) & 3
+    sample_rate_index = (header[2] >> 2) & 3
+    # only layer III has these headers
+    if version == 1 or layer != 1 or sample_rate_index == 3:
         return None
+    
+    sample_rate = MPEG_SAMPLE_RATES[version][sample_rate_index]
+    mono = (header[3] >> 6) == 3
+    if version == 3:
+        samples_per_frame = 1152
+        side_info = 17 if mono else 32
+    else:
+        samples_per_frame = 576
+        side_info = 9 if mono else 17
+    
+    f.seek(offset + 4 + side_info)
+    xing = f.read(12)
+    if xing[:4] in (b'Xing', b'Info'):
+        # without the frame count flag we'd have to guess from the bitrate
+        if len(xing) < 12 or not _be(xing[4:8]) & 1:
+            return None
+        frames = _be(xing[8:12])
+    else:
+        f.seek(offset + 36)
+        vbri = f.read(18)
+        if len(vbri) < 18 or vbri[:4] != b'VBRI':
+            return None
+        frames = _be(vbri[14:18])
+    
+    if frames == 0:
+        return None
+    return frames * samples_per_frame / sample_rate
 
-def extract_audio_metadata(file_path, m3u_base_dir=None):
-    """Extract metadata from audio file using mutagen"""
-    if not MUTAGEN_AVAILABLE:
+def _flac_header_duration(f, offset):
+    """Total samples from STREAMINFO"""
+    f.seek(offset)
+    data = f.read(4 + 4 + 18)
+    # STREAMINFO is always the first metadata block
+    if len(data) < 26 or data[:4] != b'fLaC' or (data[4] & 0x7F) != 0:
         return None
     
-    # Resolve file path (handle relative paths in m3u)
-    if not os.path.isabs(file_path) and m3u_base_dir:
-        file_path = os.path.join(m3u_base_dir, file_path)
+    info = data[8:]
+    sample_rate = _be(info[10:13]) >> 4
+    total_samples = _be(info[13:18]) & 0xFFFFFFFFF
+    if sample_rate == 0 or total_samples == 0:
+        return None
+    return total_samples / sample_rate
+
+def _find_atom(f, start, end, name):
+    """(data start, atom end) of the first `name` atom between start and end"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        size = _be(header[:4])
+        data_start = pos + 8
+        if size == 1:
+            size = _be(f.read(8))
+            data_start += 8
+        elif size == 0:
+            size = end - pos
+        if size < data_start - pos:
+            return None
+        if header[4:8] == name:
+            return data_start, pos + size
+        pos += size
+    return None
+
+def _mp4_header_duration(f, offset):
+    """Movie duration from mvhd, which is what ffprobe reports for MP4/M4A"""
+    end = os.fstat(f.fileno()).st_size
+    moov = _find_atom(f, offset, end, b'moov')
+    if moov is None:
+        return None
+    # fragmented files get their duration from the fragments
+    if _find_atom(f, moov[0], moov[1], b'mvex') is not None:
+        return None
+    mvhd = _find_atom(f, moov[0], moov[1], b'mvhd')
+    if mvhd is None:
+        return None
     
-    # Normalize path
-    file_path = os.path.normpath(file_path)
+    f.seek(mvhd[0])
+    data = f.read(32)
+    if len(data) >= 32 and data[0] == 1:
+        timescale, duration = _be(data[20:24]), _be(data[24:32])
+        unknown = 0xFFFFFFFFFFFFFFFF
+    elif len(data) >= 20 and data[0] == 0:
+        timescale, duration = _be(data[12:16]), _be(data[16:20])
+        unknown = 0xFFFFFFFF
+    else:
+        return None
     
-    if not os.path.isfile(file_path):
+    if timescale == 0 or duration in (0, unknown):
+        return None
+    return duration / timescale
+
+def read_header_duration(file_path):
+    """Exact duration read straight from the file's headers, without
+    starting ffprobe: the Xing/Info/VBRI frame count for MP3, STREAMINFO
+    total samples for FLAC and mvhd for MP4/M4A.  These are the values
+    ffprobe bases its own duration on.  Only a few KB are read (plus the
+    top-level atom headers of an MP4).  Returns None when the header is
+    missing or ambiguous, and the caller should ask ffprobe."""
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(8)
+            if head[4:8] == b'ftyp':
+                return _mp4_header_duration(f, 0)
+            
+            offset = _skip_id3v2(f)
+            f.seek(offset)
+            if f.read(4) == b'fLaC':
+                return _flac_header_duration(f, offset)
+            return _mp3_header_duration(f, offset)
+    except (OSError, ValueError):
+        return None
+
+def get_audio_duration(file_path):
+    """Duration from the file's headers when possible, otherwise ffprobe"""
+    duration = read_header_duration(file_path)
+    if duration is None:
+        duration = get_audio_duration_ffprobe(file_path)
+    return duration
+
+def get_audio_duration_ffprobe(file_path):
+    """Get precise audio duration using ffprobe (more accurate than mutagen)
+    Returns duration as float for maximum precision"""
+    return probe_audio_ffprobe(file_path)[0]
+
+def read_tags_mutagen(file_path):
+    """Title, artist and album (plus mutagen's idea of the duration) using
+    mutagen, or None if mutagen isn't available or can't read the file"""
+    if not MUTAGEN_AVAILABLE:
         return None
     
     try:
@@ -136,22 +329,10 @@ def extract_audio_metadata(file_path, m3u_base_dir=None):
             '©alb'       # Alternative M4A format
         )
         
-        # Extract duration (in seconds)
-        # Try ffprobe first for most accurate duration, fall back to mutagen
-        duration = get_audio_duration_ffprobe(file_path)
-        if duration is None:
-            # Fall back to mutagen if ffprobe fails
-            if hasattr(audio_file, 'info') and hasattr(audio_file.info, 'length'):
-                duration = float(audio_file.info.length)  # Keep as float
-            else:
-                duration = None
-        
-        if duration is not None:
-            metadata['duration_seconds'] = duration  # Store as float
-            metadata['length'] = format_length(int(duration))  # Round only for display
+        if hasattr(audio_file, 'info') and hasattr(audio_file.info, 'length'):
+            metadata['mutagen_duration'] = float(audio_file.info.length)
         else:
-            metadata['duration_seconds'] = None
-            metadata['length'] = None
+            metadata['mutagen_duration'] = None
         
         return metadata
         
@@ -159,6 +340,174 @@ def extract_audio_metadata(file_path, m3u_base_dir=None):
         # Silently fail - return None if we can't read the file
         return None
 
+def set_duration(metadata, duration):
+    if duration is not None:
+        metadata['duration_seconds'] = duration  # Store as float
+        metadata['length'] = format_length(int(duration))  # Round only for display
+    else:
+        metadata['duration_seconds'] = None
+        metadata['length'] = None
+
+def extract_audio_metadata(file_path, m3u_base_dir=None):
+    """Extract metadata from audio file using mutagen"""
+    file_path = resolve_track_path(file_path, m3u_base_dir)
+    
+    if not os.path.isfile(file_path):
+        return None
+    
+    metadata = read_tags_mutagen(file_path)
+    if metadata is None:
+        return None
+    
+    # Extract duration (in seconds)
+    # Try the headers / ffprobe first for most accurate duration, fall back
+    # to mutagen
+    duration = get_audio_duration(file_path)
+    if duration is None:
+        duration = metadata['mutagen_duration']
+    set_duration(metadata, duration)
+    
+    return metadata
+
+def open_probe_cache(config=None):
+    """Open the probe cache named by [trackupdate] probeCachePath (or the
+    default), or return None if it can't be opened"""
+    path = DEFAULT_PROBE_CACHE_PATH
+    if config is not None:
+        path = config.get('trackupdate', 'probeCachePath', fallback=path)
+    
+    try:
+        return ProbeCache(path, PROBE_CACHE_VERSION)
+    except sqlite3.Error as e:
+        print(f"Warning: unable to open probe cache {path}: {e}")
+        return None
+
+def probe_track(file_path, m3u_base_dir=None, cache=None):
+    """Duration and tags for one file, with at most one ffprobe run.
+    
+    Returns None if the file doesn't exist, otherwise a dict with
+    duration_seconds/length (from the file's headers or ffprobe, None if
+    neither worked; duration_source says which) and
+    title/artist/album under 'metadata' (from mutagen, or ffprobe's tags
+    when mutagen isn't available; None if neither could read any).
+    
+    With a ProbeCache, files that haven't changed since they were last
+    probed aren't opened at all."""
+    file_path = resolve_track_path(file_path, m3u_base_dir)
+    if not os.path.isfile(file_path):
+        return None
+    
+    if cache is not None:
+        # taken before probing, see ProbeCache.put()
+        key = cache.stat(file_path)
+        result = cache.get(key)
+        if result is not None:
+            result['file_path'] = file_path
+            return result
+    
+    metadata = read_tags_mutagen(file_path)
+    duration = read_header_duration(file_path)
+    duration_source = 'header'
+    
+    # Only start ffprobe if the headers weren't enough, or for the tags
+    # when mutagen couldn't read them
+    if duration is None or metadata is None:
+        ffprobe_duration, ffprobe_tags = probe_audio_ffprobe(file_path)
+        if duration is None:
+            duration = ffprobe_duration
+            duration_source = 'ffprobe'
+        if metadata is None and ffprobe_tags:
+            metadata = {tag: (ffprobe_tags.get(tag) or '').strip() or None
+                        for tag in ('title', 'artist', 'album')}
+    
+    result = {'metadata': metadata,
+              'duration_source': duration_source if duration is not None else None}
+    set_duration(result, duration)
+    
+    # A failed probe (ffprobe not installed, say) is worth trying again
+    # next time
+    if cache is not None and duration is not None:
+        cache.put(key, result)
+    
+    result['file_path'] = file_path
+    return result
+
+def probe_tracks(tracks, m3u_base_dir=None, max_workers=None, cache=None):
+    """probe_track() every track's file on a bounded pool of workers.
+    Results come back in playlist order (None for tracks without a file)."""
+    def probe(track):
+        if not track.get('file_path'):
+            return None
+        return probe_track(track['file_path'], m3u_base_dir, cache)
+    
+    with ThreadPoolExecutor(max_workers=max_workers or PROBE_WORKERS) as executor:
+        return list(executor.map(probe, tracks))
+
+def verify_header_durations(tracks, m3u_base_dir=None, tolerance=0.001, max_workers=None):
+    """Compare read_header_duration() with ffprobe for every file in the
+    playlist.  Returns the number of files where they differ by more than
+    `tolerance` seconds."""
+    def check(track):
+        if not track.get('file_path'):
+            return None
+        file_path = resolve_track_path(track['file_path'], m3u_base_dir)
+        if not os.path.isfile(file_path):
+            return None
+        return (file_path, read_header_duration(file_path),
+                get_audio_duration_ffprobe(file_path))
+    
+    with ThreadPoolExecutor(max_workers=max_workers or PROBE_WORKERS) as executor:
+        results = [r for r in executor.map(check, tracks) if r is not None]
+    
+    from_header = 0
+    mismatches = 0
+    for file_path, header, ffprobe in results:
+        if header is None:
+            continue
+        from_header += 1
+        if ffprobe is None:
+            print(f"  ffprobe failed: {file_path}")
+        elif abs(header - ffprobe) > tolerance:
+            mismatches += 1
+            print(f"  MISMATCH header {header:.6f}s ffprobe {ffprobe:.6f}s: {file_path}")
+    
+    print(f"{from_header} of {len(results)} files had a usable header, "
+          f"{mismatches} differ from ffprobe by more than {tolerance * 1000:g}ms")
+    return mismatches
+
+def apply_probe_results(tracks, results, artwork_url=None):
+    """Update tracks with what probe_tracks() found.
+    Returns (metadata_extracted, duration_updates)."""
+    metadata_extracted = 0
+    duration_updates = 0
+    
+    for track, result in zip(tracks, results):
+        if result is not None:
+            # The file's duration is the accurate one
+            if result['duration_seconds'] is not None:
+                original_duration = track.get('duration_seconds')
+                track['duration_seconds'] = result['duration_seconds']
+                track['length'] = format_length(result['duration_seconds'])
+                if original_duration != track['duration_seconds']:
+                    duration_updates += 1
+            
+            metadata = result['metadata']
+            if metadata:
+                # Prefer file metadata over m3u data for title, artist, and album
+                if metadata.get('title'):
+                    track['title'] = metadata['title'][:128]
+                if metadata.get('artist'):
+                    track['artist'] = metadata['artist'][:128]
+                if metadata.get('album'):
+                    track['album'] = metadata['album'][:128]
+                metadata_extracted += 1
+        
+        # Set artwork URL for all tracks
+        if artwork_url:
+            track['artworkUrl'] = artwork_url
+    
+    return metadata_extracted, duration_updates
+
 def parse_m3u(m3u_path):
     """Parse an m3u playlist file and return list of track dictionaries"""
     tracks = []
@@ -230,8 +579,282 @@ def parse_m3u(m3u_path):
     
     return tracks
 
-def concatenate_audio_files(tracks, m3u_base_dir, output_path):
-    """Concatenate all audio files from tracks into a single MP3 using ffmpeg"""
+def probe_concat_input(file_path):
+    """Codec, sample rate and channel count of a file's first audio stream,
+    plus its exact length in samples for MP3 (every packet is one frame, and
+    a stream copy keeps every packet).  Uses one ffprobe run, which reads
+    through the whole file to count the packets.  Returns None if ffprobe
+    fails or finds no audio."""
+    try:
+        cmd = [
+            'ffprobe',
+            '-v', 'error',
+            '-select_streams', 'a:0',
+            '-count_packets',
+            '-show_entries', 'stream=codec_name,sample_rate,channels,nb_read_packets',
+            '-of', 'json',
+            file_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        stream = json.loads(result.stdout)['streams'][0]
+        codec = stream['codec_name']
+        sample_rate = int(stream['sample_rate'])
+        channels = int(stream['channels'])
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError,
+            KeyError, IndexError, TypeError):
+        return None
+    
+    samples = None
+    if codec == 'mp3' and stream.get('nb_read_packets'):
+        # layer III frames are 1152 samples for MPEG 1, 576 for MPEG 2/2.5
+        samples_per_frame = 1152 if sample_rate >= 32000 else 576
+        samples = int(stream['nb_read_packets']) * samples_per_frame
+    
+    return {'format': (codec, sample_rate, channels), 'samples': samples}
+
+def write_concat_list(path, files):
+    """Write a list file for ffmpeg's concat demuxer"""
+    # Format: file 'path/to/file1.mp3'
+    #         file 'path/to/file2.mp3'
+    # Use absolute paths and proper escaping
+    with open(path, 'w', encoding='utf-8') as f:
+        for file_path in files:
+            # Escape single quotes: ' becomes '\'' in the concat file
+            # In Python string: '\\'' writes '\'' to the file
+            escaped_path = file_path.replace("'", "'\\''")
+            f.write(f"file '{escaped_path}'\n")
+
+def print_ffmpeg_errors(result):
+    """Show what went wrong in a failed ffmpeg run"""
+    print(f"\nError: ffmpeg failed with return code {result.returncode}")
+    if not result.stderr:
+        return
+    
+    # Look for specific error patterns
+    stderr_lines = result.stderr.split('\n')
+    
+    # Find errors about specific files
+    file_errors = []
+    for i, line in enumerate(stderr_lines):
+        if 'error' in line.lower() or 'failed' in line.lower() or 'cannot' in line.lower():
+            # Try to find which file caused the error
+            if i > 0 and 'file' in stderr_lines[i-1].lower():
+                file_errors.append(f"  {stderr_lines[i-1].strip()}")
+            file_errors.append(f"  {line.strip()}")
+    
+    if file_errors:
+        print("\nFile-specific errors:")
+        for err in file_errors[:10]:  # Show first 10 errors
+            print(err)
+    
+    # Show last 20 lines for context
+    print("\nLast 20 lines of ffmpeg stderr:")
+    for line in stderr_lines[-20:]:
+        if line.strip():
+            print(f"  {line}")
+
+def transcode_for_concat(file_path, out_path, target):
+    """Re-encode one file to the (codec, sample_rate, channels) of the rest
+    of the show, so it can be stream copied along with them"""
+    codec, sample_rate, channels = target
+    cmd = [
+        'ffmpeg',
+        '-v', 'error',
+        '-i', file_path,
+        '-map', '0:a:0',
+        '-map_metadata', '-1',
+        '-ar', str(sample_rate),
+        '-ac', str(channels),
+        '-c:a', 'libmp3lame',
+        '-b:a', '320k',
+        '-y',
+        out_path
+    ]
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+def concatenate_stream_copy(valid_files, output_path, max_workers=None):
+    """Join MP3s with the concat demuxer and -c copy, without decoding them.
+    
+    The most common (codec, sample rate, channels) among the MP3 inputs is
+    the target.  Files that don't match it (other codecs, a different
+    sample rate or channel count) are transcoded to it in parallel first,
+    and only those files lose a generation.
+    
+    Returns the length in seconds of each file as it sits in the output.
+    These come from counting the frames that were copied, so unlike header
+    durations they don't drift over the course of the show.  Returns None when there's nothing to stream copy (the
+    caller should re-encode instead) and False if ffmpeg failed."""
+    with ThreadPoolExecutor(max_workers=max_workers or PROBE_WORKERS) as executor:
+        inputs = list(executor.map(probe_concat_input, valid_files))
+    
+    unreadable = [path for path, info in zip(valid_files, inputs) if info is None]
+    if unreadable:
+        print(f"\nffprobe couldn't read {len(unreadable)} files, e.g. {unreadable[0]}")
+        return None
+    
+    formats = Counter(info['format'] for info in inputs if info['format'][0] == 'mp3')
+    if not formats:
+        print("\nNo MP3 inputs to stream copy")
+        return None
+    target = formats.most_common(1)[0][0]
+    odd = [n for n, info in enumerate(inputs) if info['format'] != target]
+    
+    work_dir = tempfile.mkdtemp(prefix='m3u-concat-')
+    try:
+        concat_files = list(valid_files)
+        
+        if odd:
+            print(f"\nTranscoding {len(odd)} of {len(valid_files)} files to "
+                  f"{target[1]} Hz, {target[2]} channel MP3 to match the rest...")
+            
+            def transcode(n):
+                out_path = os.path.join(work_dir, f"{n:04d}.mp3")
+                result = transcode_for_concat(valid_files[n], out_path, target)
+                if result.returncode != 0:
+                    return n, out_path, result, None
+                return n, out_path, result, probe_concat_input(out_path)
+            
+            with ThreadPoolExecutor(max_workers=TRANSCODE_WORKERS) as executor:
+                for n, out_path, result, info in executor.map(transcode, odd):
+                    if result.returncode != 0 or info is None:
+                        print(f"\nError: unable to transcode {valid_files[n]}")
+                        print_ffmpeg_errors(result)
+                        return False
+                    concat_files[n] = out_path
+                    inputs[n] = info
+        
+        if any(info['samples'] is None for info in inputs):
+            print("\nUnable to count the frames of every input")
+            return None
+        
+        concat_list_path = os.path.join(work_dir, 'concat.txt')
+        write_concat_list(concat_list_path, concat_files)
+        
+        cmd = [
+            'ffmpeg',
+            '-v', 'error',
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', concat_list_path,
+            '-map', '0:a:0',
+            '-c', 'copy',
+            '-y',  # Overwrite output file if it exists
+            output_path
+        ]
+        
+        print(f"\nRunning ffmpeg (stream copy, {len(valid_files) - len(odd)} files copied as-is)...")
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print_ffmpeg_errors(result)
+            return False
+        
+        return [info['samples'] / target[1] for info in inputs]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def decoded_duration(file_path):
+    """Length in seconds of a file's first audio stream as ffmpeg decodes
+    it, which is what the concat filter puts in the output.  Header and
+    ffprobe durations are frames x samples per frame, including the encoder
+    delay and padding that the decoder trims, so they run tens of
+    milliseconds long per track.  Decodes the whole file; returns None if
+    that fails."""
+    try:
+        cmd = [
+            'ffprobe',
+            '-v', 'error',
+            '-select_streams', 'a:0',
+            '-show_entries', 'stream=sample_rate',
+            '-of', 'json',
+            file_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        sample_rate = int(json.loads(result.stdout)['streams'][0]['sample_rate'])
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError,
+            KeyError, IndexError, TypeError):
+        return None
+    
+    # One byte per sample at the file's own rate, we only count them
+    cmd = [
+        'ffmpeg',
+        '-v', 'error',
+        '-i', file_path,
+        '-map', '0:a:0',
+        '-ac', '1',
+        '-f', 'u8',
+        '-'
+    ]
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL,
+                                stdin=subprocess.DEVNULL)
+    except FileNotFoundError:
+        return None
+    
+    samples = 0
+    with proc.stdout:
+        while True:
+            data = proc.stdout.read(1024 * 1024)
+            if not data:
+                break
+            samples += len(data)
+    
+    if proc.wait() != 0 or samples == 0:
+        return None
+    
+    return samples / sample_rate
+
+def concatenate_reencode(valid_files, output_path):
+    """Decode everything and re-encode it to a 320k MP3 with the concat
+    filter.  Works for any mix of formats.  Returns True on success."""
+    # Use concat filter instead of concat demuxer for better mixed format support
+    # The concat demuxer can fail silently with mixed formats (MP3, M4A, etc.)
+    # Build filter_complex that handles each file individually
+    print("\nBuilding ffmpeg command for mixed audio formats...")
+    
+    # Create input arguments and filter for each file
+    inputs = []
+    filter_parts = []
+    
+    for i, file_path in enumerate(valid_files):
+        inputs.extend(['-i', file_path])
+        filter_parts.append(f"[{i}:a]")
+    
+    # Create concat filter: [0:a][1:a][2:a]...concat=n=N:v=0:a=1[out]
+    filter_complex = ''.join(filter_parts) + f"concat=n={len(valid_files)}:v=0:a=1[out]"
+    
+    cmd = [
+        'ffmpeg',
+    ] + inputs + [
+        '-filter_complex', filter_complex,
+        '-map', '[out]',
+        '-c:a', 'libmp3lame',  # Encode to MP3
+        '-b:a', '320k',  # Bitrate
+        '-y',  # Overwrite output file if it exists
+        output_path
+    ]
+    
+    print("\nRunning ffmpeg (re-encoding to MP3)...")
+    print(f"Processing {len(valid_files)} files (mixed formats) - this may take a while...")
+    
+    # Run ffmpeg and capture output
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    
+    if result.returncode != 0:
+        print_ffmpeg_errors(result)
+        return False
+    
+    return True
+
+def concatenate_audio_files(tracks, m3u_base_dir, output_path, mode='copy', max_workers=None):
+    """Concatenate all audio files from tracks into a single MP3 using ffmpeg.
+    
+    In 'copy' mode MP3s are joined without re-encoding them (see
+    concatenate_stream_copy()), falling back to re-encoding everything when
+    that isn't possible; 'reencode' always re-encodes.
+    
+    Returns a list with the start offset in seconds of each track within the
+    output (None for tracks that were skipped), or False on failure."""
     
     # Check if ffmpeg is available
     try:
@@ -246,6 +869,7 @@ def concatenate_audio_files(tracks, m3u_base_dir, output_path):
     
     # Collect valid file paths with absolute paths
     valid_files = []
+    valid_indexes = []
     missing_files = []
     for i, track in enumerate(tracks, 1):
         if not track.get('file_path'):
@@ -254,15 +878,8 @@ def concatenate_audio_files(tracks, m3u_base_dir, output_path):
             continue
         
         # Resolve file path (handle relative paths in m3u)
-        file_path = track['file_path']
-        original_path = file_path
-        
-        if not os.path.isabs(file_path):
-            file_path = os.path.join(m3u_base_dir, file_path)
-        
-        # Normalize and get absolute path
-        file_path = os.path.normpath(file_path)
-        file_path = os.path.abspath(file_path)
+        original_path = track['file_path']
+        file_path = resolve_track_path(original_path, m3u_base_dir)
         
         if not os.path.isfile(file_path):
             print(f"Warning [{i}]: File not found")
@@ -280,6 +897,7 @@ def concatenate_audio_files(tracks, m3u_base_dir, output_path):
             continue
         
         valid_files.append(file_path)
+        valid_indexes.append(i - 1)
     
     if not valid_files:
         print("Error: No valid audio files found to concatenate")
@@ -291,109 +909,51 @@ def concatenate_audio_files(tracks, m3u_base_dir, output_path):
     print(f"\nConcatenating {len(valid_files)} audio files into: {output_path}")
     print(f"Total tracks in playlist: {len(tracks)}")
     
-    # Create a temporary file list for ffmpeg concat demuxer
-    # Format: file 'path/to/file1.mp3'
-    #         file 'path/to/file2.mp3'
-    # Use absolute paths and proper escaping
-    # For ffmpeg concat format, escape single quotes as '\''
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
-        concat_list_path = f.name
-        for file_path in valid_files:
-            # Escape single quotes: ' becomes '\'' in the concat file
-            # In Python string: '\\'' writes '\'' to the file
-            escaped_path = file_path.replace("'", "'\\''")
-            f.write(f"file '{escaped_path}'\n")
-        f.flush()  # Ensure all data is written
-        os.fsync(f.fileno())  # Force write to disk
+    lengths = None
+    if mode == 'copy':
+        if output_path.lower().endswith('.mp3'):
+            lengths = concatenate_stream_copy(valid_files, output_path, max_workers)
+            if lengths is False:
+                return False
+        if lengths is None:
+            print("Stream copy isn't possible for this playlist, re-encoding everything instead")
     
-    # Debug: print first few entries
-    print(f"\nConcat list file: {concat_list_path}")
-    print("First 3 entries in concat list:")
-    with open(concat_list_path, 'r', encoding='utf-8') as f:
-        for i, line in enumerate(f.readlines()[:3], 1):
-            print(f"  {i}: {line.strip()}")
-    
-    try:
-        # Use concat filter instead of concat demuxer for better mixed format support
-        # The concat demuxer can fail silently with mixed formats (MP3, M4A, etc.)
-        # Build filter_complex that handles each file individually
-        print("\nBuilding ffmpeg command for mixed audio formats...")
-        
-        # Create input arguments and filter for each file
-        inputs = []
-        filter_parts = []
-        
-        for i, file_path in enumerate(valid_files):
-            inputs.extend(['-i', file_path])
-            filter_parts.append(f"[{i}:a]")
-        
-        # Create concat filter: [0:a][1:a][2:a]...concat=n=N:v=0:a=1[out]
-        filter_complex = ''.join(filter_parts) + f"concat=n={len(valid_files)}:v=0:a=1[out]"
-        
-        cmd = [
-            'ffmpeg',
-        ] + inputs + [
-            '-filter_complex', filter_complex,
-            '-map', '[out]',
-            '-c:a', 'libmp3lame',  # Encode to MP3
-            '-b:a', '320k',  # Bitrate
-            '-y',  # Overwrite output file if it exists
-            output_path
-        ]
-        
-        print("\nRunning ffmpeg (re-encoding to MP3)...")
-        print(f"Processing {len(valid_files)} files (mixed formats) - this may take a while...")
-        
-        # Run ffmpeg and capture output
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"\nError: ffmpeg failed with return code {result.returncode}")
-            if result.stderr:
-                # Look for specific error patterns
-                stderr_lines = result.stderr.split('\n')
-                
-                # Find errors about specific files
-                file_errors = []
-                for i, line in enumerate(stderr_lines):
-                    if 'error' in line.lower() or 'failed' in line.lower() or 'cannot' in line.lower():
-                        # Try to find which file caused the error
-                        if i > 0 and 'file' in stderr_lines[i-1].lower():
-                            file_errors.append(f"  {stderr_lines[i-1].strip()}")
-                        file_errors.append(f"  {line.strip()}")
-                
-                if file_errors:
-                    print("\nFile-specific errors:")
-                    for err in file_errors[:10]:  # Show first 10 errors
-                        print(err)
-                
-                # Show last 20 lines for context
-                print("\nLast 20 lines of ffmpeg stderr:")
-                for line in stderr_lines[-20:]:
-                    if line.strip():
-                        print(f"  {line}")
+    if lengths is None:
+        if not concatenate_reencode(valid_files, output_path):
             return False
-        
-        # Check output file was created and has reasonable size
-        if os.path.isfile(output_path):
-            file_size = os.path.getsize(output_path)
-            print(f"\nSuccessfully created: {output_path}")
-            print(f"Output file size: {file_size / (1024*1024):.2f} MB")
-        else:
-            print(f"\nWarning: Output file was not created: {output_path}")
-            return False
-        
-        return True
-        
-    finally:
-        # Clean up temporary file list
-        try:
-            os.unlink(concat_list_path)
-        except OSError:
-            pass
+        # The concat filter joins decoded audio, so measure it the same way
+        # (decoding is CPU bound, hence the transcode worker count)
+        print("Measuring decoded track lengths for the track offsets...")
+        with ThreadPoolExecutor(max_workers=TRANSCODE_WORKERS) as executor:
+            lengths = list(executor.map(decoded_duration, valid_files))
+    
+    # Check output file was created and has reasonable size
+    if os.path.isfile(output_path):
+        file_size = os.path.getsize(output_path)
+        print(f"\nSuccessfully created: {output_path}")
+        print(f"Output file size: {file_size / (1024*1024):.2f} MB")
+    else:
+        print(f"\nWarning: Output file was not created: {output_path}")
+        return False
+    
+    # Where each track starts in the output.  Missing tracks aren't in it,
+    # and a file we couldn't measure leaves the rest unknown.
+    offsets = [None] * len(tracks)
+    position = 0.0
+    for index, length in zip(valid_indexes, lengths):
+        offsets[index] = position
+        if length is None:
+            break
+        position += length
+    
+    return offsets
 
-def import_m3u_to_db(tracks, m3u_path, episode_number, start_datetime, db_path, cover_image_base_url=None):
-    """Import tracks from m3u file into database"""
+def import_m3u_to_db(tracks, m3u_path, episode_number, start_datetime, db_path, cover_image_base_url=None, probe_workers=None, probe_cache=None, track_offsets=None):
+    """Import tracks from m3u file into database
+    
+    track_offsets (from concatenate_audio_files()) gives where each track
+    starts in the concatenated audio.  Tracks without one start where the
+    previous track ends."""
     
     if not tracks:
         print("Error: No tracks found in m3u file")
@@ -412,45 +972,14 @@ def import_m3u_to_db(tracks, m3u_path, episode_number, start_datetime, db_path,
     m3u_base_dir = os.path.dirname(os.path.abspath(m3u_path))
     print(f"\nExtracting metadata from audio files...")
     
-    metadata_extracted = 0
-    duration_updates = 0
-    for track in tracks:
-        original_duration = track['duration_seconds']
-        if track['file_path']:
-            # Resolve file path for duration check
-            file_path = track['file_path']
-            if not os.path.isabs(file_path):
-                file_path = os.path.join(m3u_base_dir, file_path)
-            file_path = os.path.normpath(os.path.abspath(file_path))
-            
-            # Get accurate duration using ffprobe (most accurate)
-            if os.path.isfile(file_path):
-                accurate_duration = get_audio_duration_ffprobe(file_path)
-                if accurate_duration is not None:
-                    track['duration_seconds'] = accurate_duration
-                    track['length'] = format_length(accurate_duration)
-                    if original_duration != track['duration_seconds']:
-                        duration_updates += 1
-            
-            # Also extract metadata for title, artist, album
-            metadata = extract_audio_metadata(track['file_path'], m3u_base_dir)
-            if metadata:
-                # Prefer file metadata over m3u data for title, artist, and album
-                if metadata.get('title'):
-                    track['title'] = metadata['title'][:128]
-                if metadata.get('artist'):
-                    track['artist'] = metadata['artist'][:128]
-                if metadata.get('album'):
-                    track['album'] = metadata['album'][:128]
-                # Note: duration already set above using ffprobe
-                metadata_extracted += 1
-        
-        # Set artwork URL for all tracks
-        if artwork_url:
-            track['artworkUrl'] = artwork_url
+    results = probe_tracks(tracks, m3u_base_dir, probe_workers, probe_cache)
+    metadata_extracted, duration_updates = apply_probe_results(tracks, results, artwork_url)
+    
+    if probe_cache is not None and probe_cache.hits > 0:
+        print(f"{probe_cache.hits} of {probe_cache.hits + probe_cache.misses} files were unchanged since they were last probed")
     
     if duration_updates > 0:
-        print(f"Updated {duration_updates} track durations using ffprobe (accurate file durations)")
+        print(f"Updated {duration_updates} track durations from the audio files (accurate file durations)")
     
     if metadata_extracted > 0:
         print(f"Extracted metadata from {metadata_extracted} audio files")
@@ -465,19 +994,8 @@ def import_m3u_to_db(tracks, m3u_path, episode_number, start_datetime, db_path,
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
     
-    # Ensure table exists
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS trackupdate (
-        episodeNumber integer NOT NULL,
-        uniqueId char(128),
-        title char(128),
-        artist char(128),
-        album char(128),
-        length char(128),
-        startTime timestamp(128),
-        "ignore" integer(128) NOT NULL DEFAULT(0),
-        artworkUrl text(128)
-        );''')
+    # Ensure table exists and the schema is current
+    track_schema.migrate(conn)
     
     # Calculate start times and insert tracks
     # Add 0.5 second padding to all tracks except the first to account for concatenation delays
@@ -491,6 +1009,9 @@ def import_m3u_to_db(tracks, m3u_path, episode_number, start_datetime, db_path,
     print("-" * 80)
     
     for i, track in enumerate(tracks, 1):
+        if track_offsets is not None and track_offsets[i - 1] is not None:
+            current_time = start_datetime + timedelta(seconds=track_offsets[i - 1])
+        
         # Apply padding to all tracks except the first
         track_start_time = current_time
         if i > 1:
@@ -498,7 +1019,7 @@ def import_m3u_to_db(tracks, m3u_path, episode_number, start_datetime, db_path,
         
         # Insert track with calculated start time
         debool = 1 if track['ignore'] else 0
-        c.execute("INSERT INTO trackupdate VALUES (?,?,?,?,?,?,?,?,?)",
+        c.execute(track_schema.INSERT_TRACK_SQL,
                  (episode_number,
                   track['uniqueId'],
                   track['title'],
@@ -507,7 +1028,8 @@ def import_m3u_to_db(tracks, m3u_path, episode_number, start_datetime, db_path,
                   track['length'],
                   track_start_time.isoformat(),
                   debool,
-                  track['artworkUrl']))
+                  track['artworkUrl'],
+                  track_schema.to_epoch_us(track_start_time)))
         
         album_str = f" [{track['album']}]" if track['album'] else ""
         padding_note = f" (+{CONCAT_PADDING}s)" if i > 1 else ""
@@ -562,15 +1084,21 @@ Examples:
     
     parser.add_argument('-f', '--file', required=True,
                        help='Path to m3u playlist file')
-    parser.add_argument('-e', '--episode', required=True, type=int,
+    parser.add_argument('-e', '--episode', type=int,
                        help='Episode number')
-    parser.add_argument('-d', '--datetime', required=True,
+    parser.add_argument('-d', '--datetime',
                        help='Start date and time (format: YYYY-MM-DD HH:MM:SS or YYYY-MM-DD HH:MM:SS.ffffff)')
     parser.add_argument('--db',
                        help='Path to sqlite database (default: read from ~/.trackupdaterc)')
     parser.add_argument('--concat', '--output', '-o',
                        dest='output_mp3',
                        help='Output path for concatenated MP3 file (requires ffmpeg)')
+    parser.add_argument('-j', '--jobs', type=int, default=PROBE_WORKERS,
+                       help=f'Audio files to probe at once (default: {PROBE_WORKERS})')
+    parser.add_argument('--concat-mode', choices=('copy', 'reencode'), default='copy',
+                       help='copy joins MP3s without re-encoding them (only files that differ from the rest are transcoded), reencode decodes and re-encodes everything (default: copy)')
+    parser.add_argument('--verify-durations', action='store_true',
+                       help='Check the durations read from file headers against ffprobe for every file in the playlist, then exit')
     
     args = parser.parse_args()
     
@@ -579,6 +1107,14 @@ Examples:
         print(f"Error: m3u file not found: {args.file}")
         sys.exit(1)
     
+    if args.verify_durations:
+        tracks = parse_m3u(args.file)
+        m3u_base_dir = os.path.dirname(os.path.abspath(args.file))
+        sys.exit(1 if verify_header_durations(tracks, m3u_base_dir, max_workers=args.jobs) else 0)
+    
+    if args.episode is None or args.datetime is None:
+        parser.error('the following arguments are required: -e/--episode, -d/--datetime')
+    
     # Parse start datetime
     try:
         start_datetime = parse_datetime(args.datetime)
@@ -627,6 +1163,7 @@ Examples:
         sys.exit(1)
     
     # Concatenate audio files if requested
+    track_offsets = None
     if args.output_mp3:
         output_path = os.path.expanduser(args.output_mp3)
         # Ensure output directory exists
@@ -634,12 +1171,17 @@ Examples:
         if output_dir and not os.path.isdir(output_dir):
             os.makedirs(output_dir, exist_ok=True)
         
-        concat_success = concatenate_audio_files(tracks, m3u_base_dir, output_path)
-        if not concat_success:
+        track_offsets = concatenate_audio_files(tracks, m3u_base_dir, output_path, args.concat_mode, args.jobs)
+        if track_offsets is False:
             sys.exit(1)
     
     # Import tracks to database
-    success = import_m3u_to_db(tracks, args.file, args.episode, start_datetime, db_path, cover_image_base_url)
+    probe_cache = open_probe_cache(config)
+    try:
+        success = import_m3u_to_db(tracks, args.file, args.episode, start_datetime, db_path, cover_image_base_url, args.jobs, probe_cache, track_offsets)
+    finally:
+        if probe_cache is not None:
+            probe_cache.close()
     
     if not success:
         sys.exit(1)
@@ -0,0 +1,97 @@
+# Copyright (c) 2026 Sean M. Graham <www.sean-graham.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+"""
+Persistent cache of audio file probe results (duration and tags).
+
+Entries are keyed on the file's real path and are only used while its size
+and mtime_ns still match, so editing, re-tagging or replacing a file makes
+the next lookup a miss and it gets probed again.  Shared by m3u_import.py
+and web_editor.py.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+DEFAULT_PATH = '~/.trackupdate-probe.sqlite'
+
+class ProbeCache(object):
+    def __init__(self, db_path=DEFAULT_PATH, version=1):
+        # results written by an older version of the probing code are
+        # treated as missing
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+
+        # probes run on a pool of worker threads
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.expanduser(db_path),
+                                    check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS probe (
+            path text PRIMARY KEY,
+            size integer NOT NULL,
+            mtimeNs integer NOT NULL,
+            version integer NOT NULL,
+            result text NOT NULL,
+            probed real NOT NULL
+            );''')
+        self.conn.commit()
+
+    def stat(self, file_path):
+        """(realpath, size, mtime_ns) for a file, the cache key"""
+        real_path = os.path.realpath(file_path)
+        st = os.stat(real_path)
+        return real_path, st.st_size, st.st_mtime_ns
+
+    def get(self, key):
+        """Cached result for a key from stat(), or None"""
+        real_path, size, mtime_ns = key
+        with self.lock:
+            row = self.conn.execute('''
+                SELECT result FROM probe
+                WHERE path = ? AND size = ? AND mtimeNs = ? AND version = ?''',
+                (real_path, size, mtime_ns, self.version)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """Remember a result.  Pass the key taken *before* probing, so a file
+        that changes while it's being probed is probed again next time."""
+        real_path, size, mtime_ns = key
+        with self.lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO probe
+                (path, size, mtimeNs, version, result, probed)
+                VALUES (?, ?, ?, ?, ?, ?)''',
+                (real_path, size, mtime_ns, self.version, json.dumps(result),
+                 time.time()))
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
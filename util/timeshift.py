@@ -9,6 +9,8 @@ import json
 from datetime import datetime,timedelta
 from tabulate import tabulate
 
+import track_schema
+
 
 class TimeShift(object):
     tracks = []
@@ -33,26 +35,30 @@ class TimeShift(object):
 
     def readEpisode(self, episodeNumber):
         sourceConn = sqlite3.connect(self.dbPath)
+        track_schema.migrate(sourceConn)
+        sourceConn.row_factory = sqlite3.Row
         sourceCursor = sourceConn.cursor()
         firstTime = None
 
+        # a row the schema couldn't work out a startTimeUs for has no time
+        # we could shift, and would sort ahead of the real first track
         for row in sourceCursor.execute('''
                 SELECT * FROM trackupdate
-                WHERE episodeNumber = '%s'
-                ORDER BY startTime''' % episodeNumber):
+                WHERE episodeNumber = ? AND startTimeUs IS NOT NULL
+                ORDER BY startTimeUs''', (episodeNumber,)):
 
             track = {}
 
-            track['episodeNumber'] = row[0]
-            track['uniqueId'] = row[1]
-            track['title'] = row[2]
-            track['artist'] = row[3]
-            track['album'] = row[4]
-            track['length'] = row[5]
-            track['sTime'] = datetime.fromisoformat(row[6])
-            track['origTime'] = datetime.fromisoformat(row[6])
-            track['ignore'] = row[7]
-            track['artworkUrl'] = row[8]
+            track['episodeNumber'] = row['episodeNumber']
+            track['uniqueId'] = row['uniqueId']
+            track['title'] = row['title']
+            track['artist'] = row['artist']
+            track['album'] = row['album']
+            track['length'] = row['length']
+            track['sTime'] = track_schema.from_epoch_us(row['startTimeUs'])
+            track['origTime'] = track['sTime']
+            track['ignore'] = row['ignore']
+            track['artworkUrl'] = row['artworkUrl']
 
             if(firstTime == None):
                 firstTime = track['sTime']
@@ -133,22 +139,11 @@ class TimeShift(object):
         destConn = sqlite3.connect(self.dbPath)
         destCursor = destConn.cursor()
 
-        destCursor.execute('''
-                CREATE TABLE IF NOT EXISTS trackupdate (
-                episodeNumber integer NOT NULL,
-                uniqueId char(128),
-                title char(128),
-                artist char(128),
-                album char(128),
-                length char(128),
-                startTime timestamp(128),
-                "ignore" integer(128) NOT NULL DEFAULT(0),
-                artworkUrl text(128)
-                );''')
+        track_schema.migrate(destConn)
 
 
         for track in self.tracks:
-            destCursor.execute("INSERT INTO trackupdate VALUES (?,?,?,?,?,?,?,?,?)",
+            destCursor.execute(track_schema.INSERT_TRACK_SQL,
                             (track["episodeNumber"],
                                 track["uniqueId"],
                                 track["title"],
@@ -157,7 +152,8 @@ class TimeShift(object):
                                 track["length"],
                                 track["sTime"],
                                 track["ignore"],
-                                track["artworkUrl"]))
+                                track["artworkUrl"],
+                                track_schema.to_epoch_us(track["sTime"])))
             destConn.commit()
 
         destConn.close()
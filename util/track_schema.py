@@ -0,0 +1,268 @@
+# Copyright (c) 2026 Sean M. Graham <www.sean-graham.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+"""
+Schema for the trackupdate sqlite database.
+
+Everything that writes to the database calls migrate() right after
+connecting.  The schema version lives in PRAGMA user_version; each entry in
+MIGRATIONS takes the database from version N to N+1, so running migrate()
+again (or from several programs at once) is harmless.
+
+startTime is kept as text for compatibility, but ordering and range queries
+should use startTimeUs: the same wall-clock time as an integer count of
+microseconds since 1970-01-01.  Writers should fill in both columns;
+triggers work out startTimeUs for any that only set startTime.
+"""
+
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+
+def to_epoch_us(value):
+    """Convert a datetime (or an ISO format string) to startTimeUs"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+
+    # startTime is stored as naive wall-clock time, do the same here
+    value = value.replace(tzinfo=None)
+
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+def from_epoch_us(value):
+    """Convert a startTimeUs value back to a naive datetime"""
+    return EPOCH + timedelta(microseconds=value)
+
+def start_time_sql(us_expr):
+    """SQL expression turning a startTimeUs expression back into startTime
+    text ('YYYY-MM-DD HH:MM:SS.ffffff'), for set-based updates"""
+    return (f"(strftime('%Y-%m-%d %H:%M:%S', ({us_expr}) / 1000000, 'unixepoch')"
+            f" || '.' || printf('%06d', ({us_expr}) % 1000000))")
+
+def start_time_us_sql(text_expr):
+    """SQL expression turning startTime text into startTimeUs (NULL if it
+    can't be parsed), the reverse of start_time_sql()"""
+    return (f"(CAST(strftime('%s', {text_expr}) AS integer) * 1000000"
+            f" + CASE WHEN instr({text_expr}, '.') > 0"
+            f" THEN CAST(substr(substr({text_expr}, instr({text_expr}, '.') + 1)"
+            f" || '000000', 1, 6) AS integer) ELSE 0 END)")
+
+def _backfill_start_time_us(conn):
+    rows = conn.execute('''
+        SELECT rowid, startTime FROM trackupdate
+        WHERE startTimeUs IS NULL AND startTime IS NOT NULL''').fetchall()
+
+    updates = []
+    for rowid, start_time in rows:
+        try:
+            updates.append((to_epoch_us(start_time), rowid))
+        except (TypeError, ValueError):
+            # leave unparseable rows alone rather than failing the migration
+            continue
+
+    conn.executemany('UPDATE trackupdate SET startTimeUs = ? WHERE rowid = ?',
+                     updates)
+
+def _check_non_numeric_episode(conn):
+    # live mode logs to episode "XX" unless given -e, make sure the triggers
+    # accept that before the migration is committed
+    conn.execute('SAVEPOINT check_episode')
+    try:
+        conn.execute('''
+            INSERT INTO trackupdate (episodeNumber, title, startTime, startTimeUs)
+            VALUES ('XX', 'migration check', '1970-01-01T00:00:00', 0)''')
+    finally:
+        conn.execute('ROLLBACK TO check_episode')
+        conn.execute('RELEASE check_episode')
+
+MIGRATIONS = [
+    # 1: the original table, plus indexes for the per-episode queries
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS trackupdate (
+        episodeNumber integer NOT NULL,
+        uniqueId char(128),
+        title char(128),
+        artist char(128),
+        album char(128),
+        length char(128),
+        startTime timestamp(128),
+        "ignore" integer(128) NOT NULL DEFAULT(0),
+        artworkUrl text(128)
+        );''',
+        '''
+        CREATE INDEX IF NOT EXISTS trackupdate_episode_start
+        ON trackupdate (episodeNumber, startTime);''',
+        '''
+        CREATE INDEX IF NOT EXISTS trackupdate_episode_uniqueid
+        ON trackupdate (episodeNumber, uniqueId);''',
+    ],
+    # 2: numeric start time so ordering doesn't depend on the text format
+    [
+        'ALTER TABLE trackupdate ADD COLUMN startTimeUs integer;',
+        _backfill_start_time_us,
+        '''
+        CREATE INDEX IF NOT EXISTS trackupdate_episode_starttimeus
+        ON trackupdate (episodeNumber, startTimeUs);''',
+        # writers that predate startTimeUs (or older copies of this program)
+        # only set startTime; work the number out for them
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trackupdate_start_time_us_insert
+        AFTER INSERT ON trackupdate
+        WHEN NEW.startTimeUs IS NULL AND NEW.startTime IS NOT NULL
+        BEGIN
+            UPDATE trackupdate
+            SET startTimeUs = {start_time_us_sql('NEW.startTime')}
+            WHERE rowid = NEW.rowid;
+        END;''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trackupdate_start_time_us_update
+        AFTER UPDATE OF startTime ON trackupdate
+        WHEN NEW.startTime IS NOT OLD.startTime
+             AND NEW.startTimeUs IS OLD.startTimeUs
+        BEGIN
+            UPDATE trackupdate
+            SET startTimeUs = {start_time_us_sql('NEW.startTime')}
+            WHERE rowid = NEW.rowid;
+        END;''',
+    ],
+    # 3: per-episode change versions, so readers can ask for just the rows
+    # changed since a version they already have.  Triggers keep everything
+    # up to date no matter which program does the writing.
+    [
+        'ALTER TABLE trackupdate ADD COLUMN rowVersion integer NOT NULL DEFAULT 0;',
+        # not an integer PRIMARY KEY: that would make it a rowid alias and
+        # reject episode numbers like "XX"
+        '''
+        CREATE TABLE IF NOT EXISTS episode_version (
+        episodeNumber integer NOT NULL UNIQUE,
+        version integer NOT NULL DEFAULT 0
+        );''',
+        '''
+        CREATE TABLE IF NOT EXISTS trackupdate_deleted (
+        episodeNumber integer NOT NULL,
+        trackRowid integer NOT NULL,
+        version integer NOT NULL
+        );''',
+        '''
+        CREATE INDEX IF NOT EXISTS trackupdate_deleted_episode_version
+        ON trackupdate_deleted (episodeNumber, version);''',
+        '''
+        CREATE INDEX IF NOT EXISTS trackupdate_episode_rowversion
+        ON trackupdate (episodeNumber, rowVersion);''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trackupdate_version_insert
+        AFTER INSERT ON trackupdate
+        BEGIN
+            INSERT OR IGNORE INTO episode_version (episodeNumber, version)
+            VALUES (NEW.episodeNumber, 0);
+            UPDATE episode_version SET version = version + 1
+            WHERE episodeNumber = NEW.episodeNumber;
+            UPDATE trackupdate SET rowVersion = (
+                SELECT version FROM episode_version
+                WHERE episodeNumber = NEW.episodeNumber)
+            WHERE rowid = NEW.rowid;
+        END;''',
+        # rowVersion is left out of the column list so the trigger's own
+        # UPDATE doesn't set it off again
+        '''
+        CREATE TRIGGER IF NOT EXISTS trackupdate_version_update
+        AFTER UPDATE OF episodeNumber, uniqueId, title, artist, album, length,
+                        startTime, "ignore", artworkUrl, startTimeUs
+        ON trackupdate
+        BEGIN
+            INSERT OR IGNORE INTO episode_version (episodeNumber, version)
+            VALUES (NEW.episodeNumber, 0);
+            UPDATE episode_version SET version = version + 1
+            WHERE episodeNumber IN (OLD.episodeNumber, NEW.episodeNumber);
+            INSERT INTO trackupdate_deleted (episodeNumber, trackRowid, version)
+            SELECT OLD.episodeNumber, OLD.rowid, version FROM episode_version
+            WHERE episodeNumber = OLD.episodeNumber
+              AND OLD.episodeNumber IS NOT NEW.episodeNumber;
+            UPDATE trackupdate SET rowVersion = (
+                SELECT version FROM episode_version
+                WHERE episodeNumber = NEW.episodeNumber)
+            WHERE rowid = NEW.rowid;
+        END;''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trackupdate_version_delete
+        AFTER DELETE ON trackupdate
+        BEGIN
+            INSERT OR IGNORE INTO episode_version (episodeNumber, version)
+            VALUES (OLD.episodeNumber, 0);
+            UPDATE episode_version SET version = version + 1
+            WHERE episodeNumber = OLD.episodeNumber;
+            INSERT INTO trackupdate_deleted (episodeNumber, trackRowid, version)
+            SELECT OLD.episodeNumber, OLD.rowid, version FROM episode_version
+            WHERE episodeNumber = OLD.episodeNumber;
+        END;''',
+        _check_non_numeric_episode,
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Writers should name their columns (the table grows over time)
+INSERT_TRACK_SQL = '''
+    INSERT INTO trackupdate
+    (episodeNumber, uniqueId, title, artist, album, length, startTime,
+     "ignore", artworkUrl, startTimeUs)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+def get_episode_version(conn, episode_number):
+    """Current change version of an episode (0 if it has never changed)"""
+    row = conn.execute('''
+        SELECT version FROM episode_version WHERE episodeNumber = ?''',
+        (episode_number,)).fetchone()
+    return row[0] if row else 0
+
+def get_schema_version(conn):
+    """Return the schema version recorded in the database"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn):
+    """Bring the database up to SCHEMA_VERSION, returns the final version"""
+    # commit anything the caller left open so we can start our own
+    # transaction
+    if conn.in_transaction:
+        conn.commit()
+
+    while True:
+        # IMMEDIATE takes the write lock up front, so two programs starting
+        # at the same time can't both apply the same step
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = get_schema_version(conn)
+            if version >= SCHEMA_VERSION:
+                conn.rollback()
+                return version
+
+            for statement in MIGRATIONS[version]:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+
+            # PRAGMA doesn't take parameters
+            conn.execute(f'PRAGMA user_version = {version + 1:d}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
@@ -0,0 +1,245 @@
+# Copyright (c) 2026 Sean M. Graham <www.sean-graham.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+"""
+Persistent, content-addressed store for audio uploaded to the web editor.
+
+Files are stored once per SHA-256 of their contents, as
+objects/<sha256><ext>, so uploading the same show twice keeps one copy (and
+one set of waveform peaks, in peaks/<stored name>/).  A small sqlite index
+remembers the original names, which episodes each file belongs to and when
+it was last used.  When the store grows past max_bytes the least recently
+used files are removed, the ones not linked to any episode first.
+"""
+
+import os
+import re
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+
+HASH_READ_SIZE = 1024 * 1024
+
+# don't write to the index on every range request, once in a while is plenty
+TOUCH_INTERVAL = 60 * 60
+
+def hash_file(path, hasher=None):
+    """sha256 of a file (or carry on an existing hasher over it)"""
+    if hasher is None:
+        hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(HASH_READ_SIZE)
+            if not data:
+                break
+            hasher.update(data)
+    return hasher
+
+def is_sha256(value):
+    return bool(re.fullmatch(r'[0-9a-f]{64}', value or ''))
+
+class UploadStore(object):
+    def __init__(self, root, max_bytes):
+        self.root = os.path.expanduser(root)
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(self.root, 'objects')
+        self.peaks_dir = os.path.join(self.root, 'peaks')
+        self.partial_dir = os.path.join(self.root, 'partial')
+
+        for path in (self.objects_dir, self.peaks_dir, self.partial_dir):
+            os.makedirs(path, exist_ok=True)
+
+        # used from every request thread
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(self.root, 'uploads.sqlite'),
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS uploads (
+            sha256 text PRIMARY KEY,
+            filename text NOT NULL,
+            originalName text,
+            size integer NOT NULL,
+            created real NOT NULL,
+            used real NOT NULL
+            );''')
+        self.conn.execute('''
+            CREATE INDEX IF NOT EXISTS uploads_used ON uploads (used);''')
+        self.conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS uploads_filename
+            ON uploads (filename);''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS upload_episodes (
+            sha256 text NOT NULL,
+            episodeNumber integer NOT NULL,
+            linked real NOT NULL,
+            PRIMARY KEY (sha256, episodeNumber)
+            );''')
+        self.conn.execute('''
+            CREATE INDEX IF NOT EXISTS upload_episodes_episode
+            ON upload_episodes (episodeNumber, linked);''')
+        self.conn.commit()
+
+    def get_peaks_dir(self, filename):
+        return os.path.join(self.peaks_dir, filename)
+
+    def find(self, sha256):
+        """The stored entry for a hash, or None"""
+        with self.lock:
+            row = self.conn.execute('SELECT * FROM uploads WHERE sha256 = ?',
+                                    (sha256,)).fetchone()
+        if row is None or not os.path.isfile(os.path.join(self.objects_dir,
+                                                          row['filename'])):
+            return None
+        return dict(row)
+
+    def add(self, src_path, sha256, original_name):
+        """Move a fully received file into the store.  If the same content is
+        already there src_path is just deleted.  Returns (entry, duplicate)."""
+        existing = self.find(sha256)
+        if existing is not None:
+            os.remove(src_path)
+            self.touch(existing['filename'], force=True)
+            return existing, True
+
+        ext = os.path.splitext(original_name or '')[1].lower()
+        filename = sha256 + ext
+        size = os.path.getsize(src_path)
+        now = time.time()
+
+        os.replace(src_path, os.path.join(self.objects_dir, filename))
+
+        with self.lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO uploads
+                (sha256, filename, originalName, size, created, used)
+                VALUES (?, ?, ?, ?, ?, ?)''',
+                (sha256, filename, original_name, size, now, now))
+            self.conn.commit()
+
+        self.evict(keep=sha256)
+        return self.find(sha256), False
+
+    def touch(self, filename, force=False):
+        """Mark a stored file as used"""
+        now = time.time()
+        cutoff = now if force else now - TOUCH_INTERVAL
+        with self.lock:
+            self.conn.execute('''
+                UPDATE uploads SET used = ?
+                WHERE filename = ? AND used < ?''', (now, filename, cutoff))
+            self.conn.commit()
+
+    def link(self, sha256, episode_number):
+        with self.lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO upload_episodes
+                (sha256, episodeNumber, linked) VALUES (?, ?, ?)''',
+                (sha256, episode_number, time.time()))
+            self.conn.commit()
+
+    def unlink_episode(self, episode_number):
+        with self.lock:
+            self.conn.execute('DELETE FROM upload_episodes WHERE episodeNumber = ?',
+                              (episode_number,))
+            self.conn.commit()
+
+    def episode_uploads(self, episode_number):
+        """Files linked to an episode, most recently linked first"""
+        with self.lock:
+            rows = self.conn.execute('''
+                SELECT u.* FROM upload_episodes e
+                JOIN uploads u ON u.sha256 = e.sha256
+                WHERE e.episodeNumber = ?
+                ORDER BY e.linked DESC''', (episode_number,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def evict(self, keep=None):
+        """Remove least recently used files until the store fits in
+        max_bytes.  Returns the entries removed."""
+        with self.lock:
+            total = self.conn.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM uploads').fetchone()[0]
+            if total <= self.max_bytes:
+                return []
+
+            candidates = self.conn.execute('''
+                SELECT u.*, EXISTS (SELECT 1 FROM upload_episodes e
+                                    WHERE e.sha256 = u.sha256) AS linked
+                FROM uploads u
+                WHERE u.sha256 IS NOT ?
+                ORDER BY linked, u.used''', (keep,)).fetchall()
+
+            removed = []
+            for row in candidates:
+                if total <= self.max_bytes:
+                    break
+                self.conn.execute('DELETE FROM uploads WHERE sha256 = ?',
+                                  (row['sha256'],))
+                self.conn.execute('DELETE FROM upload_episodes WHERE sha256 = ?',
+                                  (row['sha256'],))
+                total -= row['size']
+                removed.append(dict(row))
+            self.conn.commit()
+
+        for row in removed:
+            try:
+                os.remove(os.path.join(self.objects_dir, row['filename']))
+            except FileNotFoundError:
+                pass
+            shutil.rmtree(self.get_peaks_dir(row['filename']), ignore_errors=True)
+
+        return removed
+
+    def clean_partials(self, max_age):
+        """Throw away chunked uploads nobody has touched in max_age seconds.
+        Returns the ids of the uploads removed."""
+        cutoff = time.time() - max_age
+        uploads = {}
+        for name in os.listdir(self.partial_dir):
+            path = os.path.join(self.partial_dir, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            # an upload is as recent as the newer of its .part and .json
+            upload_id = os.path.splitext(name)[0]
+            paths, newest = uploads.get(upload_id, ([], 0))
+            uploads[upload_id] = (paths + [path], max(newest, mtime))
+
+        removed = []
+        for upload_id, (paths, newest) in uploads.items():
+            if newest >= cutoff:
+                continue
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            removed.append(upload_id)
+
+        return removed
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,208 @@
+# Copyright (c) 2026 Sean M. Graham <www.sean-graham.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+"""
+Precomputed waveform peaks for the web editor.
+
+The audio is decoded once with ffmpeg (mono, low sample rate) and reduced to
+a min/max pair per bucket at several zoom levels.  Each level is written as
+its own file of little-endian int16 pairs (min, max, min, max, ...), next to
+an index.json describing the levels, so the browser can draw the waveform
+from a few hundred KB instead of decoding the whole show.
+"""
+
+import os
+import sys
+import json
+import array
+import shutil
+import tempfile
+import subprocess
+
+# 4kHz is plenty for drawing an envelope and keeps the reduction cheap
+SAMPLE_RATE = 4000
+BASE_SAMPLES_PER_PEAK = 16     # level 0: 250 peaks per second
+LEVEL_FACTOR = 4               # each level is 4x coarser than the last
+LEVEL_COUNT = 4                # 250, 62.5, 15.6 and 3.9 peaks per second
+
+INDEX_NAME = 'index.json'
+PEAKS_FORMAT = 'int16le-minmax'
+
+# samples read from ffmpeg per pass, a multiple of BASE_SAMPLES_PER_PEAK
+READ_SAMPLES = BASE_SAMPLES_PER_PEAK * 16384
+
+def level_filename(level):
+    return f'level{level:d}.i16'
+
+def _reduce(values, factor, fn):
+    """Apply fn (min or max) to each run of `factor` values"""
+    full = len(values) // factor * factor
+    # one strided slice per position in the run, so the loop stays in C
+    out = array.array('h', map(fn, *(values[k:full:factor]
+                                     for k in range(factor))))
+    if full < len(values):
+        out.append(fn(values[full:]))
+    return out
+
+def _write_level(path, mins, maxs):
+    peaks = array.array('h', bytes(4 * len(mins)))
+    peaks[0::2] = mins
+    peaks[1::2] = maxs
+    if sys.byteorder == 'big':
+        peaks.byteswap()
+
+    with open(path, 'wb') as f:
+        peaks.tofile(f)
+
+def audio_stamp(audio_path):
+    """Identifies the version of the audio file the peaks were made from"""
+    st = os.stat(audio_path)
+    return {'size': st.st_size, 'mtimeNs': st.st_mtime_ns}
+
+def read_index(out_dir, audio_path=None):
+    """Return the peaks index in out_dir, or None if there isn't a usable one
+    (missing, or made from a different version of audio_path)"""
+    try:
+        with open(os.path.join(out_dir, INDEX_NAME)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if audio_path is not None:
+        try:
+            if index.get('source') != audio_stamp(audio_path):
+                return None
+        except OSError:
+            return None
+
+    return index
+
+def compute_peaks(audio_path, out_dir):
+    """Decode audio_path and write its peaks to out_dir, returns the index.
+    Raises RuntimeError if ffmpeg is missing or can't decode the file."""
+    source = audio_stamp(audio_path)
+
+    cmd = [
+        'ffmpeg',
+        '-v', 'error',
+        '-i', audio_path,
+        '-vn',
+        '-ac', '1',
+        '-ar', str(SAMPLE_RATE),
+        '-f', 's16le',
+        '-'
+    ]
+    # stderr goes to a file: a pipe nobody reads until stdout is done can
+    # fill up and leave ffmpeg and us waiting on each other
+    errors = tempfile.TemporaryFile()
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                stderr=errors,
+                                stdin=subprocess.DEVNULL)
+    except FileNotFoundError:
+        errors.close()
+        raise RuntimeError('ffmpeg not found')
+
+    mins = array.array('h')
+    maxs = array.array('h')
+    sample_count = 0
+
+    # reduce while ffmpeg is still decoding
+    chunk_bytes = READ_SAMPLES * 2
+    pending = b''
+    while True:
+        data = proc.stdout.read(chunk_bytes)
+        if not data:
+            break
+        pending += data
+        usable = len(pending) // chunk_bytes * chunk_bytes
+        if usable == 0:
+            continue
+
+        samples = array.array('h')
+        samples.frombytes(pending[:usable])
+        pending = pending[usable:]
+        if sys.byteorder == 'big':
+            samples.byteswap()
+
+        mins.extend(_reduce(samples, BASE_SAMPLES_PER_PEAK, min))
+        maxs.extend(_reduce(samples, BASE_SAMPLES_PER_PEAK, max))
+        sample_count += len(samples)
+
+    proc.stdout.close()
+    proc.wait()
+    with errors:
+        if proc.returncode != 0:
+            errors.seek(0)
+            stderr = errors.read()
+            raise RuntimeError(f'ffmpeg failed: {stderr.decode(errors="replace").strip()}')
+
+    # whatever is left over (drop a trailing odd byte)
+    if len(pending) >= 2:
+        samples = array.array('h')
+        samples.frombytes(pending[:len(pending) // 2 * 2])
+        if sys.byteorder == 'big':
+            samples.byteswap()
+        mins.extend(_reduce(samples, BASE_SAMPLES_PER_PEAK, min))
+        maxs.extend(_reduce(samples, BASE_SAMPLES_PER_PEAK, max))
+        sample_count += len(samples)
+
+    if sample_count == 0:
+        raise RuntimeError('No audio decoded')
+
+    # write everything to a scratch directory and move it into place, so a
+    # reader never sees half a set of levels
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.peaks-')
+    try:
+        levels = []
+        samples_per_peak = BASE_SAMPLES_PER_PEAK
+        for level in range(LEVEL_COUNT):
+            if level > 0:
+                mins = _reduce(mins, LEVEL_FACTOR, min)
+                maxs = _reduce(maxs, LEVEL_FACTOR, max)
+                samples_per_peak *= LEVEL_FACTOR
+
+            _write_level(os.path.join(tmp_dir, level_filename(level)), mins, maxs)
+            levels.append({
+                'level': level,
+                'peaksPerSecond': SAMPLE_RATE / samples_per_peak,
+                'count': len(mins)
+            })
+
+        index = {
+            'format': PEAKS_FORMAT,
+            'sampleRate': SAMPLE_RATE,
+            'duration': sample_count / SAMPLE_RATE,
+            'levels': levels,
+            'source': source
+        }
+        with open(os.path.join(tmp_dir, INDEX_NAME), 'w') as f:
+            json.dump(index, f)
+
+        if os.path.isdir(out_dir):
+            shutil.rmtree(out_dir)
+        os.rename(tmp_dir, out_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    return index
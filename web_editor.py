@@ -11,10 +11,15 @@ import sqlite3
 import configparser
 import json
 import re
+import queue
 import subprocess
+import threading
+import hashlib
+import uuid
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, g
 from werkzeug.utils import secure_filename
+from werkzeug.http import parse_content_range_header
 import tempfile
 
 # Import m3u import functions
@@ -22,39 +27,134 @@ util_path = os.path.join(os.path.dirname(__file__), 'util')
 if util_path not in sys.path:
     sys.path.append(util_path)
 try:
-    from m3u_import import parse_m3u, extract_audio_metadata, get_audio_duration_ffprobe, format_length as format_length_m3u, parse_length_seconds
+    from m3u_import import parse_m3u, probe_tracks, apply_probe_results, open_probe_cache, parse_length_seconds
     M3U_IMPORT_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: M3U import not available: {e}")
     M3U_IMPORT_AVAILABLE = False
 
+import track_schema
+import waveform_peaks
+import upload_store as upload_store_module
+
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = tempfile.mkdtemp()
+# Scratch space for files that are only needed during a request (m3u imports)
+app.config['TEMP_FOLDER'] = tempfile.mkdtemp()
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
 
+CONFIG_PATH = os.path.expanduser('~/.trackupdaterc')
+DEFAULT_DB_PATH = os.path.expanduser('~/src/trackupdate/db/trackupdate.sqlite')
+DEFAULT_UPLOAD_DIR = '~/.trackupdate-uploads'
+DEFAULT_UPLOAD_STORE_MB = 20 * 1024
+PARTIAL_UPLOAD_MAX_AGE = 24 * 60 * 60  # abandoned chunked uploads are dropped
+
+# sqlite connection pool settings
+DB_POOL_SIZE = 4
+DB_CACHE_SIZE_KB = 20000               # PRAGMA cache_size (negative = KiB)
+DB_MMAP_SIZE = 256 * 1024 * 1024       # PRAGMA mmap_size
+
+# Uploads and audio serving
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024    # chunk size suggested to the browser
+UPLOAD_COPY_SIZE = 1024 * 1024         # bytes per read when streaming to disk
+AUDIO_MAX_AGE = 3600                   # Cache-Control max-age for audio
+PEAKS_RETRY_AFTER = 2                  # seconds between polls for pending peaks
+
+def load_config():
+    """Read ~/.trackupdaterc (an empty config if it doesn't exist)"""
+    config = configparser.ConfigParser()
+    if os.path.isfile(CONFIG_PATH):
+        config.read(CONFIG_PATH)
+    return config
+
+# The config is read once at startup rather than on every request
+CONFIG = load_config()
+
 # Get database path from config
 def get_db_path():
-    config_path = os.path.expanduser('~/.trackupdaterc')
-    if not os.path.isfile(config_path):
-        # Fallback to default
-        return os.path.expanduser('~/src/trackupdate/db/trackupdate.sqlite')
-    
-    config = configparser.ConfigParser()
-    config.read(config_path)
-    
     try:
-        db_path = config.get('SqliteTarget', 'dbPath')
+        db_path = CONFIG.get('SqliteTarget', 'dbPath')
         return os.path.expanduser(db_path)
     except (configparser.NoSectionError, configparser.NoOptionError):
         # Fallback to default
-        return os.path.expanduser('~/src/trackupdate/db/trackupdate.sqlite')
+        return DEFAULT_DB_PATH
 
-def get_db_connection():
-    db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
+DB_PATH = get_db_path()
+
+# Let a front-end server (nginx, Apache) send audio files via X-Sendfile
+app.config['USE_X_SENDFILE'] = CONFIG.getboolean('WebEditor', 'useXSendfile',
+                                                 fallback=False)
+
+# Uploaded audio lives in a persistent, content-addressed store
+upload_store = upload_store_module.UploadStore(
+    CONFIG.get('WebEditor', 'uploadDir', fallback=DEFAULT_UPLOAD_DIR),
+    CONFIG.getint('WebEditor', 'uploadStoreMB',
+                  fallback=DEFAULT_UPLOAD_STORE_MB) * 1024 * 1024)
+app.config['UPLOAD_FOLDER'] = upload_store.objects_dir
+
+# Durations and tags of library files, shared with util/m3u_import.py
+probe_cache = open_probe_cache(CONFIG) if M3U_IMPORT_AVAILABLE else None
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that goes back to the pool instead of closing.
+
+    Handlers still call conn.close() when they're done; that just throws
+    away anything they didn't commit.  The connection itself is handed back
+    to the pool when the request is torn down."""
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def really_close(self):
+        super().close()
+
+_db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_schema_checked = False
+
+def open_db_connection():
+    """Open a new pooled connection with our pragmas applied"""
+    global _schema_checked
+    # Connections move between request threads, but only one uses it at a time
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False,
+                           factory=PooledConnection)
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB:d}')
+    conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE:d}')
+
+    # Create the table / apply pending migrations once per process
+    if not _schema_checked:
+        track_schema.migrate(conn)
+        _schema_checked = True
+
+    return conn
+
+def get_db_connection():
+    """Get this request's connection, borrowing one from the pool if needed"""
+    conn = g.get('db_conn')
+    if conn is None:
+        try:
+            conn = _db_pool.get_nowait()
+        except queue.Empty:
+            conn = open_db_connection()
+        g.db_conn = conn
     return conn
 
+@app.teardown_appcontext
+def release_db_connection(exc):
+    """Return the request's connection to the pool"""
+    conn = g.pop('db_conn', None)
+    if conn is None:
+        return
+
+    if conn.in_transaction:
+        conn.rollback()
+
+    try:
+        _db_pool.put_nowait(conn)
+    except queue.Full:
+        conn.really_close()
+
 def parse_length(length_str):
     """Parse length string like '4:20' into seconds"""
     if not length_str:
@@ -129,6 +229,9 @@ def delete_episode(episode_number):
         conn.commit()
         conn.close()
         
+        # The audio stays in the store until it's evicted
+        upload_store.unlink_episode(episode_number)
+        
         return jsonify({'success': True})
     except Exception as e:
         print(f"Error deleting episode: {e}")
@@ -136,25 +239,81 @@ def delete_episode(episode_number):
 
 @app.route('/api/episodes/<int:episode_number>/tracks')
 def get_tracks(episode_number):
-    """Get all tracks for an episode"""
+    """Get all tracks for an episode
+    
+    The response carries an ETag built from the episode's change version,
+    and If-None-Match is answered with 304 when nothing has changed.  With
+    ?since=<version> only the tracks changed after that version are
+    returned, along with the rowids of tracks deleted since then."""
     conn = get_db_connection()
     cursor = conn.cursor()
     
+    # Read the version before the rows: if a write sneaks in between, the
+    # client just gets those rows again next time
+    version = track_schema.get_episode_version(conn, episode_number)
+    etag = f"{episode_number}-{version}"
+    
+    if request.if_none_match.contains_weak(etag):
+        conn.close()
+        response = app.response_class(status=304)
+    else:
+        since = request.args.get('since', type=int)
+        if since is not None and since > version:
+            # Client is ahead of us (database replaced?), send everything
+            since = None
+        
+        result = fetch_tracks(cursor, episode_number, since, version)
+        conn.close()
+        response = jsonify(result)
+    
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def fetch_tracks(cursor, episode_number, since=None, version=None):
+    """Build the track list (and first track time) for an episode
+    
+    If since is given only tracks changed after that version are included,
+    plus the rowids of tracks deleted after it."""
+    if version is None:
+        version = track_schema.get_episode_version(cursor.connection, episode_number)
+    
+    # Offsets are always relative to the episode's first track
     cursor.execute('''
-        SELECT rowid, * FROM trackupdate
+        SELECT MIN(startTimeUs) FROM trackupdate
         WHERE episodeNumber = ?
-        ORDER BY datetime(startTime) ASC
     ''', (episode_number,))
+    first_us = cursor.fetchone()[0]
+    
+    if since is None:
+        cursor.execute('''
+            SELECT rowid, * FROM trackupdate
+            WHERE episodeNumber = ?
+            ORDER BY startTimeUs ASC
+        ''', (episode_number,))
+    else:
+        cursor.execute('''
+            SELECT rowid, * FROM trackupdate
+            WHERE episodeNumber = ? AND rowVersion > ?
+            ORDER BY startTimeUs ASC
+        ''', (episode_number, since))
     
     tracks = []
-    first_time = None
     
     for row in cursor.fetchall():
-        start_time = datetime.fromisoformat(row['startTime'])
-        if first_time is None:
-            first_time = start_time
+        start_us = row['startTimeUs']
+        if start_us is None:
+            # The schema's trigger fills this in, but it can't parse every
+            # startTime an outside writer might have stored
+            try:
+                start_us = track_schema.to_epoch_us(row['startTime'])
+            except (TypeError, ValueError):
+                pass
         
-        elapsed = (start_time - first_time).total_seconds()
+        if start_us is None or first_us is None:
+            elapsed = 0
+        else:
+            elapsed = (start_us - first_us) / 1000000
         length_seconds = parse_length(row['length'])
         
         # Use rowid as ID if uniqueId is not available
@@ -177,12 +336,21 @@ def get_tracks(episode_number):
         }
         tracks.append(track)
     
-    conn.close()
-    
-    return jsonify({
+    result = {
         'tracks': tracks,
-        'firstTime': format_timestamp(first_time) if first_time else None
-    })
+        'firstTime': format_timestamp(track_schema.from_epoch_us(first_us)) if first_us is not None else None,
+        'version': version
+    }
+    
+    if since is not None:
+        cursor.execute('''
+            SELECT DISTINCT trackRowid FROM trackupdate_deleted
+            WHERE episodeNumber = ? AND version > ?
+        ''', (episode_number, since))
+        result['since'] = since
+        result['deleted'] = [row[0] for row in cursor.fetchall()]
+    
+    return result
 
 @app.route('/api/episodes/<int:episode_number>/tracks', methods=['POST'])
 def create_track(episode_number):
@@ -193,25 +361,14 @@ def create_track(episode_number):
     cursor = conn.cursor()
     
     # Get the first track time to calculate relative position
-    cursor.execute('''
-        SELECT startTime FROM trackupdate
-        WHERE episodeNumber = ?
-        ORDER BY startTime LIMIT 1
-    ''', (episode_number,))
-    
-    first_row = cursor.fetchone()
-    if first_row:
-        first_time = datetime.fromisoformat(first_row['startTime'])
+    first_time = get_episode_anchor(cursor, episode_number)
+    if first_time is not None:
         start_time = first_time + timedelta(seconds=data['startTimeSeconds'])
     else:
         # No existing tracks, use current time as base and add the offset
         start_time = datetime.now() + timedelta(seconds=data.get('startTimeSeconds', 0))
     
-    cursor.execute('''
-        INSERT INTO trackupdate 
-        (episodeNumber, uniqueId, title, artist, album, length, startTime, "ignore", artworkUrl)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
+    cursor.execute(track_schema.INSERT_TRACK_SQL, (
         episode_number,
         data.get('uniqueId'),
         data.get('title', ''),
@@ -220,7 +377,8 @@ def create_track(episode_number):
         data.get('length', '0:00'),
         format_timestamp(start_time),
         1 if data.get('ignore', False) else 0,
-        data.get('artworkUrl', '')
+        data.get('artworkUrl', ''),
+        track_schema.to_epoch_us(start_time)
     ))
     
     conn.commit()
@@ -229,6 +387,145 @@ def create_track(episode_number):
     
     return jsonify({'success': True, 'id': track_id}), 201
 
+def get_episode_anchor(cursor, episode_number):
+    """Start time of the episode's first track (None if it has no tracks)"""
+    # MIN() skips rows without a startTimeUs, like fetch_tracks() does
+    cursor.execute('''
+        SELECT MIN(startTimeUs) AS firstUs FROM trackupdate
+        WHERE episodeNumber = ?
+    ''', (episode_number,))
+    
+    first_us = cursor.fetchone()['firstUs']
+    if first_us is not None:
+        return track_schema.from_epoch_us(first_us)
+    return None
+
+def track_values(data, start_time):
+    """Column values (uniqueId .. startTimeUs) for a track from request data"""
+    return (
+        data.get('uniqueId'),
+        data.get('title', ''),
+        data.get('artist', ''),
+        data.get('album', ''),
+        data.get('length', '0:00'),
+        format_timestamp(start_time),
+        1 if data.get('ignore', False) else 0,
+        data.get('artworkUrl', ''),
+        track_schema.to_epoch_us(start_time)
+    )
+
+@app.route('/api/episodes/<int:episode_number>/tracks', methods=['PATCH'])
+def batch_tracks(episode_number):
+    """Apply many track edits in one transaction
+    
+    Body: {"operations": [
+        {"op": "create", "track": {...}},
+        {"op": "update", "id": "<track_id>", "track": {...}},
+        {"op": "delete", "id": "<track_id>"}
+    ]}
+    
+    Track data is the same as for POST/PUT, with startTimeSeconds relative to
+    the episode's first track as it was before the batch.  Operations are
+    applied in the order given.  If any operation is invalid (400) or names a
+    track that doesn't exist (404) nothing is applied.  Returns a result per
+    operation plus the updated track list."""
+    data = request.json or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list):
+        return jsonify({'error': 'Expected object with "operations" array.'}), 400
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    # The anchor is worked out once for the whole batch
+    first_time = get_episode_anchor(cursor, episode_number)
+    now = datetime.now()
+    
+    def start_time_for(track, default_offset):
+        if first_time is not None:
+            return first_time + timedelta(seconds=track['startTimeSeconds'])
+        return now + timedelta(seconds=track.get('startTimeSeconds', default_offset))
+    
+    def track_match(track_id):
+        """WHERE clause and parameters picking out one track of the episode"""
+        if str(track_id).startswith('rowid_'):
+            return 'episodeNumber = ? AND rowid = ?', (episode_number, int(str(track_id).split('_')[1]))
+        return 'episodeNumber = ? AND uniqueId = ?', (episode_number, track_id)
+    
+    set_columns = '''
+        SET uniqueId = ?, title = ?, artist = ?, album = ?,
+            length = ?, startTime = ?, "ignore" = ?, artworkUrl = ?,
+            startTimeUs = ?
+    '''
+    
+    # Check every operation before touching the database
+    results = []
+    statements = []
+    
+    for index, operation in enumerate(operations):
+        result = {'index': index, 'op': operation.get('op') if isinstance(operation, dict) else None}
+        results.append(result)
+        
+        try:
+            op = result['op']
+            track = operation.get('track') or {}
+            track_id = operation.get('id')
+            
+            if op in ('update', 'delete') and not track_id:
+                raise ValueError('id is required')
+            
+            if op == 'create':
+                statements.append((result, track_schema.INSERT_TRACK_SQL,
+                                   (episode_number,) + track_values(track, start_time_for(track, 0))))
+            elif op == 'update':
+                values = track_values(track, start_time_for(track, 0) if first_time is not None else now)
+                where, params = track_match(track_id)
+                statements.append((result, f'UPDATE trackupdate {set_columns} WHERE {where}',
+                                   values + params))
+            elif op == 'delete':
+                where, params = track_match(track_id)
+                statements.append((result, f'DELETE FROM trackupdate WHERE {where}', params))
+            else:
+                raise ValueError(f'Unknown op: {op}')
+            
+            result['success'] = True
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            result['success'] = False
+            result['error'] = str(e)
+    
+    if not all(result['success'] for result in results):
+        conn.close()
+        return jsonify({'success': False, 'results': results}), 400
+    
+    try:
+        for result, sql, params in statements:
+            cursor.execute(sql, params)
+            
+            if result['op'] == 'create':
+                result['id'] = cursor.lastrowid
+            elif cursor.rowcount == 0:
+                # Nothing is applied, so no operation succeeded
+                conn.rollback()
+                conn.close()
+                for other in results:
+                    other['success'] = False
+                    other.pop('id', None)
+                result['error'] = 'Track not found'
+                return jsonify({'success': False, 'results': results}), 404
+        
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+    
+    response = fetch_tracks(cursor, episode_number)
+    conn.close()
+    
+    response['success'] = True
+    response['results'] = results
+    return jsonify(response)
+
 @app.route('/api/episodes/<int:episode_number>/tracks/<track_id>', methods=['PUT'])
 def update_track(episode_number, track_id):
     """Update a track"""
@@ -238,15 +535,8 @@ def update_track(episode_number, track_id):
     cursor = conn.cursor()
     
     # Get first track time for relative positioning
-    cursor.execute('''
-        SELECT startTime FROM trackupdate
-        WHERE episodeNumber = ?
-        ORDER BY startTime LIMIT 1
-    ''', (episode_number,))
-    
-    first_row = cursor.fetchone()
-    if first_row:
-        first_time = datetime.fromisoformat(first_row['startTime'])
+    first_time = get_episode_anchor(cursor, episode_number)
+    if first_time is not None:
         start_time = first_time + timedelta(seconds=data['startTimeSeconds'])
     else:
         start_time = datetime.now()
@@ -258,7 +548,8 @@ def update_track(episode_number, track_id):
         cursor.execute('''
             UPDATE trackupdate
             SET uniqueId = ?, title = ?, artist = ?, album = ?, 
-                length = ?, startTime = ?, "ignore" = ?, artworkUrl = ?
+                length = ?, startTime = ?, "ignore" = ?, artworkUrl = ?,
+                startTimeUs = ?
             WHERE rowid = ?
         ''', (
             data.get('uniqueId'),
@@ -269,6 +560,7 @@ def update_track(episode_number, track_id):
             format_timestamp(start_time),
             1 if data.get('ignore', False) else 0,
             data.get('artworkUrl', ''),
+            track_schema.to_epoch_us(start_time),
             rowid
         ))
     else:
@@ -276,7 +568,8 @@ def update_track(episode_number, track_id):
         cursor.execute('''
             UPDATE trackupdate
             SET uniqueId = ?, title = ?, artist = ?, album = ?, 
-                length = ?, startTime = ?, "ignore" = ?, artworkUrl = ?
+                length = ?, startTime = ?, "ignore" = ?, artworkUrl = ?,
+                startTimeUs = ?
             WHERE episodeNumber = ? AND uniqueId = ?
         ''', (
             data.get('uniqueId'),
@@ -287,6 +580,7 @@ def update_track(episode_number, track_id):
             format_timestamp(start_time),
             1 if data.get('ignore', False) else 0,
             data.get('artworkUrl', ''),
+            track_schema.to_epoch_us(start_time),
             episode_number,
             track_id
         ))
@@ -320,43 +614,85 @@ def delete_track(episode_number, track_id):
 
 @app.route('/api/episodes/<int:episode_number>/tracks/shift', methods=['POST'])
 def shift_tracks(episode_number):
-    """Shift a range of tracks by a time delta"""
-    data = request.json
-    start_index = data.get('startIndex', 0)
-    end_index = data.get('endIndex')
-    delta_seconds = data.get('deltaSeconds', 0)
+    """Shift one or more ranges of tracks by a time delta
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    Accepts either a single range ({startIndex, endIndex, deltaSeconds}) or
+    {ranges: [{startIndex, endIndex, deltaSeconds}, ...]}.  Indexes refer to
+    the episode's track order before the shift and endIndex is exclusive
+    (null means "to the end").  Overlapping ranges add up.  All ranges are
+    applied with one UPDATE in one transaction, and the updated track list
+    is returned."""
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a shift range object'}), 400
     
-    # Get all tracks for the episode
-    cursor.execute('''
-        SELECT rowid, startTime FROM trackupdate
-        WHERE episodeNumber = ?
-        ORDER BY startTime
-    ''', (episode_number,))
+    ranges = data.get('ranges')
+    if ranges is None:
+        ranges = [data]
+    if not isinstance(ranges, list):
+        return jsonify({'error': '"ranges" must be an array'}), 400
+    
+    params = []
+    for r in ranges:
+        if not isinstance(r, dict):
+            return jsonify({'error': 'Invalid shift range'}), 400
+        try:
+            start_index = int(r.get('startIndex') or 0)
+            end_index = r.get('endIndex')
+            end_index = -1 if end_index is None else int(end_index)
+            delta_us = int(round(float(r.get('deltaSeconds', 0)) * 1000000))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid shift range'}), 400
+        params.extend([start_index, end_index, delta_us])
+    
+    if not ranges:
+        return jsonify({'error': 'No ranges given'}), 400
     
-    tracks = cursor.fetchall()
+    conn = get_db_connection()
+    cursor = conn.cursor()
     
-    if end_index is None:
-        end_index = len(tracks)
+    # Number the episode's tracks in order, add up the deltas of every range
+    # each one falls in, and apply them all in a single statement
+    range_values = ', '.join(['(?, ?, ?)'] * len(ranges))
+    new_us = 'trackupdate.startTimeUs + shifted.delta'
     
-    # Update tracks in range
-    for i in range(start_index, min(end_index, len(tracks))):
-        track = tracks[i]
-        old_time = datetime.fromisoformat(track['startTime'])
-        new_time = old_time + timedelta(seconds=delta_seconds)
-        
-        cursor.execute('''
+    try:
+        cursor.execute(f'''
+            WITH ranges (startIndex, endIndex, delta) AS (VALUES {range_values}),
+            ordered AS (
+                SELECT rowid AS rid,
+                       ROW_NUMBER() OVER (ORDER BY startTimeUs, rowid) - 1 AS idx
+                FROM trackupdate
+                WHERE episodeNumber = ?
+            ),
+            shifted AS (
+                SELECT ordered.rid AS rid, SUM(ranges.delta) AS delta
+                FROM ordered JOIN ranges
+                ON ordered.idx >= ranges.startIndex
+                   AND (ranges.endIndex < 0 OR ordered.idx < ranges.endIndex)
+                GROUP BY ordered.rid
+            )
             UPDATE trackupdate
-            SET startTime = ?
-            WHERE rowid = ?
-        ''', (format_timestamp(new_time), track['rowid']))
+            SET startTimeUs = {new_us},
+                startTime = {track_schema.start_time_sql(new_us)}
+            FROM shifted
+            WHERE trackupdate.rowid = shifted.rid
+        ''', params + [episode_number])
+        
+        # rowcount is -1 for UPDATE ... FROM; changes() counts only this
+        # statement's rows, not the episode_version trigger's
+        shifted_count = conn.execute('SELECT changes()').fetchone()[0]
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
     
-    conn.commit()
+    result = fetch_tracks(cursor, episode_number)
     conn.close()
     
-    return jsonify({'success': True})
+    result['success'] = True
+    result['shifted'] = shifted_count
+    return jsonify(result)
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
@@ -368,20 +704,345 @@ def upload_file():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    filename = secure_filename(file.filename)
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
+    # Hash while copying into the store's scratch space
+    fd, tmp_path = tempfile.mkstemp(dir=upload_store.partial_dir, suffix='.part')
+    hasher = hashlib.sha256()
+    with os.fdopen(fd, 'wb') as f:
+        while True:
+            data = file.stream.read(UPLOAD_COPY_SIZE)
+            if not data:
+                break
+            f.write(data)
+            hasher.update(data)
     
-    return jsonify({
+    return jsonify(finish_upload(tmp_path, hasher.hexdigest(), file.filename,
+                                 request.form.get('episodeNumber', type=int)))
+
+# upload id -> lock, so two requests can't write the same upload at once
+_upload_locks = {}
+# upload id -> (sha256 of the data so far, how many bytes that covers)
+_upload_hashers = {}
+_upload_locks_lock = threading.Lock()
+
+def get_partial_paths(upload_id):
+    """(data, metadata) paths of a chunked upload, or None for a bad id"""
+    if not re.fullmatch(r'[0-9a-f]{32}', upload_id):
+        return None
+    base = os.path.join(upload_store.partial_dir, upload_id)
+    return base + '.part', base + '.json'
+
+def read_upload_status(upload_id):
+    """Metadata of a chunked upload plus how much of it has arrived"""
+    paths = get_partial_paths(upload_id)
+    if paths is None:
+        return None
+    part_path, meta_path = paths
+    try:
+        with open(meta_path) as f:
+            status = json.load(f)
+        status['offset'] = os.path.getsize(part_path)
+    except (OSError, ValueError):
+        return None
+    status['uploadId'] = upload_id
+    status['complete'] = False
+    return status
+
+def clean_partial_uploads():
+    """Throw away abandoned chunked uploads, and what we kept in memory
+    for them"""
+    removed = upload_store.clean_partials(PARTIAL_UPLOAD_MAX_AGE)
+    with _upload_locks_lock:
+        for upload_id in removed:
+            _upload_hashers.pop(upload_id, None)
+            _upload_locks.pop(upload_id, None)
+
+clean_partial_uploads()
+
+def get_upload_hasher(upload_id, part_path, offset):
+    """sha256 of what has arrived so far.  Carried over from the previous
+    chunk when possible, otherwise (after a restart, or a chunk that broke
+    off) worked out again from the file."""
+    with _upload_locks_lock:
+        hasher, length = _upload_hashers.pop(upload_id, (None, None))
+    if hasher is None or length != offset:
+        hasher = upload_store_module.hash_file(part_path)
+    return hasher
+
+def upload_result(entry, duplicate, episode_number=None):
+    """Response for an upload that is in the store"""
+    if episode_number is not None:
+        upload_store.link(entry['sha256'], episode_number)
+    
+    filename = entry['filename']
+    # Start on the waveform peaks now so they're likely ready by the time
+    # the browser asks for them (a duplicate usually has them already)
+    if waveform_peaks.read_index(get_peaks_dir(filename),
+                                 os.path.join(app.config['UPLOAD_FOLDER'], filename)) is None:
+        start_peaks_job(filename)
+    
+    return {
         'success': True,
+        'complete': True,
+        'duplicate': duplicate,
+        'sha256': entry['sha256'],
         'filename': filename,
-        'url': f'/api/audio/{filename}'
-    })
+        'originalName': entry['originalName'],
+        'size': entry['size'],
+        'offset': entry['size'],
+        'url': f'/api/audio/{filename}',
+        'peaksUrl': f'/api/audio/{filename}/peaks'
+    }
+
+def finish_upload(src_path, sha256, original_name, episode_number=None):
+    """Move a fully received upload into the store"""
+    entry, duplicate = upload_store.add(src_path, sha256,
+                                        secure_filename(original_name))
+    # add() has just evicted what no longer fits, clear out abandoned
+    # partial uploads along with it
+    clean_partial_uploads()
+    return upload_result(entry, duplicate, episode_number)
+
+@app.route('/api/uploads', methods=['POST'])
+def start_upload():
+    """Start a chunked upload.  The file is then sent with PUT requests
+    carrying a Content-Range header, in order, and can be resumed from the
+    offset reported by GET if a chunk fails.  If the client already knows
+    the file's sha256 and the store has it, nothing needs to be sent."""
+    data = request.json or {}
+    filename = secure_filename(data.get('filename', ''))
+    try:
+        size = int(data.get('size'))
+        episode_number = data.get('episodeNumber')
+        if episode_number is not None:
+            episode_number = int(episode_number)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size (and episodeNumber, if given) must be integers'}), 400
+    
+    if filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    if size <= 0:
+        return jsonify({'error': 'Empty file'}), 400
+    
+    sha256 = data.get('sha256')
+    if upload_store_module.is_sha256(sha256):
+        entry = upload_store.find(sha256)
+        if entry is not None and entry['size'] == size:
+            upload_store.touch(entry['filename'], force=True)
+            return jsonify(upload_result(entry, True, episode_number))
+    
+    clean_partial_uploads()
+    
+    upload_id = uuid.uuid4().hex
+    part_path, meta_path = get_partial_paths(upload_id)
+    open(part_path, 'wb').close()
+    with open(meta_path, 'w') as f:
+        json.dump({'filename': filename, 'size': size,
+                   'episodeNumber': episode_number,
+                   # checked once everything has arrived
+                   'sha256': sha256 if upload_store_module.is_sha256(sha256) else None}, f)
+    
+    status = read_upload_status(upload_id)
+    status['chunkSize'] = UPLOAD_CHUNK_SIZE
+    return jsonify(status)
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """How much of a chunked upload has arrived"""
+    status = read_upload_status(upload_id)
+    if status is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(status)
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """Append one chunk to a chunked upload, streaming it to disk"""
+    if get_partial_paths(upload_id) is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    # The lock stays in the table until the upload finishes or is
+    # cancelled, so every request for this upload contends on the same one
+    with _upload_locks_lock:
+        lock = _upload_locks.setdefault(upload_id, threading.Lock())
+    if not lock.acquire(blocking=False):
+        status = read_upload_status(upload_id) or {}
+        status['error'] = 'Another chunk is being written'
+        return jsonify(status), 409
+    
+    try:
+        # Only look at the offset once we hold the lock, otherwise two
+        # requests for the same chunk could both think it's theirs
+        status = read_upload_status(upload_id)
+        if status is None:
+            return jsonify({'error': 'Upload not found'}), 404
+        
+        content_range = parse_content_range_header(request.headers.get('Content-Range'))
+        if (content_range is None or content_range.units != 'bytes' or
+                content_range.start is None or content_range.length != status['size']):
+            return jsonify({'error': 'A valid Content-Range header is required'}), 400
+        
+        # Chunks have to arrive in order; tell the client where to carry on
+        if content_range.start != status['offset']:
+            status['error'] = 'Chunk does not start at the current offset'
+            return jsonify(status), 409
+        
+        part_path, meta_path = get_partial_paths(upload_id)
+        hasher = get_upload_hasher(upload_id, part_path, status['offset'])
+        written = 0
+        remaining = content_range.stop - content_range.start
+        # Append and hash as the data arrives.  If the connection drops part
+        # way, whatever made it to disk counts and the client resumes from
+        # there.
+        try:
+            with open(part_path, 'ab') as f:
+                while remaining > 0:
+                    data = request.stream.read(min(UPLOAD_COPY_SIZE, remaining))
+                    if not data:
+                        break
+                    f.write(data)
+                    hasher.update(data)
+                    written += len(data)
+                    remaining -= len(data)
+        finally:
+            with _upload_locks_lock:
+                _upload_hashers[upload_id] = (hasher, status['offset'] + written)
+        
+        status = read_upload_status(upload_id)
+        if status['offset'] < status['size']:
+            return jsonify(status)
+        
+        # get_upload_hasher() re-reads the file if the running hash doesn't
+        # cover exactly what's on disk
+        hasher = get_upload_hasher(upload_id, part_path, status['offset'])
+        sha256 = hasher.hexdigest()
+        if status['offset'] != status['size'] or (
+                status.get('sha256') and status['sha256'] != sha256):
+            # Not what the client said it was sending, start again
+            for path in (part_path, meta_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            with _upload_locks_lock:
+                _upload_locks.pop(upload_id, None)
+            return jsonify({'error': 'Upload does not match its size or sha256, '
+                                     'please upload it again'}), 422
+        
+        result = finish_upload(part_path, sha256, status['filename'],
+                               status.get('episodeNumber'))
+        os.remove(meta_path)
+        with _upload_locks_lock:
+            _upload_locks.pop(upload_id, None)
+    finally:
+        lock.release()
+    
+    return jsonify(result)
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def cancel_upload(upload_id):
+    """Abandon a chunked upload"""
+    paths = get_partial_paths(upload_id)
+    if paths is None or not os.path.exists(paths[1]):
+        return jsonify({'error': 'Upload not found'}), 404
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    with _upload_locks_lock:
+        _upload_hashers.pop(upload_id, None)
+        _upload_locks.pop(upload_id, None)
+    return jsonify({'success': True})
+
+@app.route('/api/episodes/<int:episode_number>/audio')
+def get_episode_audio(episode_number):
+    """Audio files uploaded for an episode, most recent first"""
+    uploads = []
+    for entry in upload_store.episode_uploads(episode_number):
+        filename = entry['filename']
+        uploads.append({
+            'sha256': entry['sha256'],
+            'filename': filename,
+            'originalName': entry['originalName'],
+            'size': entry['size'],
+            'url': f'/api/audio/{filename}',
+            'peaksUrl': f'/api/audio/{filename}/peaks'
+        })
+    return jsonify({'episodeNumber': episode_number, 'uploads': uploads})
 
 @app.route('/api/audio/<filename>')
 def serve_audio(filename):
-    """Serve uploaded audio files"""
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    """Serve uploaded audio files.  Range requests (206) and conditional
+    requests (ETag / Last-Modified, 304) are supported, so seeking only
+    fetches the bytes it needs.  The file is handed to the WSGI server's
+    file_wrapper (sendfile where available), or to the front-end server
+    when useXSendfile is set."""
+    upload_store.touch(secure_filename(filename))
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename,
+                               conditional=True, etag=True,
+                               max_age=AUDIO_MAX_AGE)
+
+# filename -> {'thread': ..., 'error': ...} for peaks being computed
+_peaks_jobs = {}
+_peaks_lock = threading.Lock()
+
+def get_peaks_dir(filename):
+    return upload_store.get_peaks_dir(filename)
+
+def start_peaks_job(filename):
+    """Compute peaks for an uploaded file in the background, unless that's
+    already happening.  Returns the job."""
+    audio_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    
+    with _peaks_lock:
+        job = _peaks_jobs.get(filename)
+        if job is not None and job['thread'].is_alive():
+            return job
+        
+        job = {'error': None}
+        
+        def run():
+            try:
+                waveform_peaks.compute_peaks(audio_path, get_peaks_dir(filename))
+            except Exception as e:
+                print(f"Error computing waveform peaks for {filename}: {e}")
+                job['error'] = str(e)
+        
+        job['thread'] = threading.Thread(target=run, daemon=True)
+        _peaks_jobs[filename] = job
+        job['thread'].start()
+        return job
+
+@app.route('/api/audio/<filename>/peaks')
+def get_peaks(filename):
+    """Index of the precomputed waveform peaks for an uploaded file.
+    Returns 202 while they're still being computed."""
+    filename = secure_filename(filename)
+    audio_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if not os.path.isfile(audio_path):
+        return jsonify({'error': 'Audio file not found'}), 404
+    
+    index = waveform_peaks.read_index(get_peaks_dir(filename), audio_path)
+    if index is not None:
+        return jsonify(index)
+    
+    with _peaks_lock:
+        job = _peaks_jobs.get(filename)
+    
+    if job is not None and job['error'] is not None and not job['thread'].is_alive():
+        return jsonify({'error': job['error']}), 500
+    
+    # Missing or stale (the file was uploaded again), (re)compute
+    if job is None or not job['thread'].is_alive():
+        start_peaks_job(filename)
+    
+    return jsonify({'status': 'pending'}), 202, {'Retry-After': str(PEAKS_RETRY_AFTER)}
+
+@app.route('/api/audio/<filename>/peaks/<int:level>')
+def serve_peaks(filename, level):
+    """Raw peaks for one zoom level (little-endian int16 min/max pairs)"""
+    return send_from_directory(get_peaks_dir(secure_filename(filename)),
+                               waveform_peaks.level_filename(level),
+                               mimetype='application/octet-stream')
 
 @app.route('/api/import/m3u', methods=['POST'])
 def import_m3u():
@@ -416,7 +1077,7 @@ def import_m3u():
         
         # Save uploaded m3u file temporarily
         m3u_filename = secure_filename(m3u_file.filename)
-        m3u_path = os.path.join(app.config['UPLOAD_FOLDER'], m3u_filename)
+        m3u_path = os.path.join(app.config['TEMP_FOLDER'], m3u_filename)
         m3u_file.save(m3u_path)
         
         # Parse m3u file
@@ -424,77 +1085,27 @@ def import_m3u():
         if not tracks:
             return jsonify({'error': 'No tracks found in m3u file'}), 400
         
-        # Get database path and config
-        db_path = get_db_path()
-        config_path = os.path.expanduser('~/.trackupdaterc')
+        # Get cover image settings from the config
         cover_image_base_url = None
+        try:
+            cover_image_base_url = CONFIG.get('trackupdate', 'coverImageBaseURL')
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            pass
         
-        if os.path.isfile(config_path):
-            config = configparser.ConfigParser()
-            config.read(config_path)
-            try:
-                cover_image_base_url = config.get('trackupdate', 'coverImageBaseURL')
-            except (configparser.NoSectionError, configparser.NoOptionError):
-                pass
-        
-        # Extract metadata from audio files
+        # Extract metadata from audio files (in parallel, in playlist order)
         m3u_base_dir = os.path.dirname(os.path.abspath(m3u_path))
-        metadata_extracted = 0
-        duration_updates = 0
-        
-        for track in tracks:
-            original_duration = track.get('duration_seconds')
-            if track.get('file_path'):
-                file_path = track['file_path']
-                if not os.path.isabs(file_path):
-                    file_path = os.path.join(m3u_base_dir, file_path)
-                file_path = os.path.normpath(os.path.abspath(file_path))
-                
-                # Get accurate duration
-                if os.path.isfile(file_path):
-                    accurate_duration = get_audio_duration_ffprobe(file_path)
-                    if accurate_duration is not None:
-                        track['duration_seconds'] = accurate_duration
-                        track['length'] = format_length_m3u(accurate_duration)
-                        if original_duration != track['duration_seconds']:
-                            duration_updates += 1
-                
-                # Extract metadata
-                metadata = extract_audio_metadata(track['file_path'], m3u_base_dir)
-                if metadata:
-                    if metadata.get('title'):
-                        track['title'] = metadata['title'][:128]
-                    if metadata.get('artist'):
-                        track['artist'] = metadata['artist'][:128]
-                    if metadata.get('album'):
-                        track['album'] = metadata['album'][:128]
-                    metadata_extracted += 1
-            
-            # Set artwork URL
-            if cover_image_base_url:
-                artwork_filename = start_datetime.strftime("%Y%m%d.jpg")
-                track['artworkUrl'] = f"{cover_image_base_url}/{artwork_filename}"
-            else:
-                track['artworkUrl'] = ""
+        artwork_url = ""
+        if cover_image_base_url:
+            artwork_filename = start_datetime.strftime("%Y%m%d.jpg")
+            artwork_url = f"{cover_image_base_url}/{artwork_filename}"
+        
+        results = probe_tracks(tracks, m3u_base_dir, cache=probe_cache)
+        metadata_extracted, duration_updates = apply_probe_results(tracks, results, artwork_url)
         
         # Connect to database and import tracks
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Ensure table exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS trackupdate (
-            episodeNumber integer NOT NULL,
-            uniqueId char(128),
-            title char(128),
-            artist char(128),
-            album char(128),
-            length char(128),
-            startTime timestamp(128),
-            "ignore" integer(128) NOT NULL DEFAULT(0),
-            artworkUrl text(128)
-            );''')
-        
         # Calculate start times and insert tracks
         CONCAT_PADDING = 0.0
         current_time = start_datetime
@@ -506,7 +1117,7 @@ def import_m3u():
                 track_start_time += timedelta(seconds=CONCAT_PADDING)
             
             debool = 1 if track.get('ignore', False) else 0
-            cursor.execute("INSERT INTO trackupdate VALUES (?,?,?,?,?,?,?,?,?)",
+            cursor.execute(track_schema.INSERT_TRACK_SQL,
                          (episode_number,
                           track.get('uniqueId', ''),
                           track.get('title', ''),
@@ -515,7 +1126,8 @@ def import_m3u():
                           track.get('length', '0:00'),
                           format_timestamp(track_start_time),
                           debool,
-                          track.get('artworkUrl', '')))
+                          track.get('artworkUrl', ''),
+                          track_schema.to_epoch_us(track_start_time)))
             
             current_time += timedelta(seconds=track.get('duration_seconds', 0))
             inserted_count += 1
@@ -598,7 +1210,7 @@ def import_episode(episode_number):
                 # Fallback to current time if no first time provided
                 start_time = datetime.now() + timedelta(seconds=track_data.get('startTimeSeconds', 0))
             
-            cursor.execute("INSERT INTO trackupdate VALUES (?,?,?,?,?,?,?,?,?)",
+            cursor.execute(track_schema.INSERT_TRACK_SQL,
                          (episode_number,
                           track_data.get('uniqueId', ''),
                           track_data.get('title', ''),
@@ -607,7 +1219,8 @@ def import_episode(episode_number):
                           track_data.get('length', '0:00'),
                           format_timestamp(start_time),
                           1 if track_data.get('ignore', False) else 0,
-                          track_data.get('artworkUrl', '')))
+                          track_data.get('artworkUrl', ''),
+                          track_schema.to_epoch_us(start_time)))
             inserted_count += 1
         
         conn.commit()
@@ -625,7 +1238,7 @@ def import_episode(episode_number):
 if __name__ == '__main__':
     print(f"Starting track editor web server...")
     print(f"Database path: {get_db_path()}")
-    print(f"Upload folder: {app.config['UPLOAD_FOLDER']}")
+    print(f"Upload store: {upload_store.root}")
     print(f"Open http://localhost:5000 in your browser")
     app.run(debug=True, port=5000)
 